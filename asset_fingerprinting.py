@@ -0,0 +1,156 @@
+# This file gives the assets the build generates (mapbox images, json data) content hashed names,
+# so netlify can serve them as immutable and returning visitors never download them twice
+#
+# The manifest (data/generated_assets.json, also readable by hugo as site.Data.generated_assets) maps
+# each asset's logical url, i.e. /mapbox/mapbox-2022-08-15.png, to its current fingerprinted url,
+# i.e. /mapbox/mapbox-2022-08-15.3f2a9c0d1b4e.png
+#
+# The assets every site build regenerates (i.e. the static maps) are recorded in a separate manifest,
+# data/build_assets.json, which like the assets themselves is not committed
+from __future__ import annotations
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+STATIC_FOLDER_PATH = Path("./static")
+ASSET_MANIFEST_PATH = Path("./data/generated_assets.json")
+BUILD_ASSET_MANIFEST_PATH = Path("./data/build_assets.json")
+NETLIFY_HEADERS_PATH = STATIC_FOLDER_PATH.joinpath("_headers")
+
+FINGERPRINT_LENGTH = 12
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_FINGERPRINTED_NAME = re.compile(r"^(?P<stem>.+)\.(?P<fingerprint>[0-9a-f]{%d})(?P<suffix>\.[^.]+)$" % FINGERPRINT_LENGTH)
+
+
+def fingerprinted_name(file_name: str, content: bytes) -> str:
+    """
+    mapbox-2022-08-15.png => mapbox-2022-08-15.<first 12 hex digits of the sha256 of content>.png
+    """
+    path = Path(file_name)
+    fingerprint = hashlib.sha256(content).hexdigest()[:FINGERPRINT_LENGTH]
+    return f"{path.stem}.{fingerprint}{path.suffix}"
+
+
+class AssetManifest:
+    """
+    Logical url => fingerprinted url of every generated asset in the static folder
+    (the committed assets and the build's own assets are kept apart, each saved to its own manifest)
+    """
+
+    def __init__(self, manifest_path: Path = ASSET_MANIFEST_PATH, static_folder_path: Path = STATIC_FOLDER_PATH,
+                       build_manifest_path: Path = BUILD_ASSET_MANIFEST_PATH) -> None:
+        self._manifest_path = manifest_path
+        self._build_manifest_path = build_manifest_path
+        self._static_folder_path = static_folder_path
+        self._assets = self._load(manifest_path)
+        self._build_assets = self._load(build_manifest_path)
+
+    @staticmethod
+    def _load(manifest_path: Path) -> Dict[str, str]:
+        if not manifest_path.exists():
+            return {}
+        with open(manifest_path, "r") as manifest_f:
+            return json.load(manifest_f)
+
+    def _all_assets(self) -> Dict[str, str]:
+        return {**self._assets, **self._build_assets}
+
+    def _static_path(self, url: str) -> Path:
+        return self._static_folder_path.joinpath(url.lstrip("/"))
+
+    def _logical_url(self, static_path: Path) -> str:
+        return "/" + static_path.relative_to(self._static_folder_path).as_posix()
+
+    def _write(self, assets: Dict[str, str], logical_url: str, content: bytes) -> str:
+        logical_path = self._static_path(logical_url)
+        logical_path.parent.mkdir(parents=True, exist_ok=True)
+        fingerprinted_path = logical_path.with_name(fingerprinted_name(logical_path.name, content))
+        if not fingerprinted_path.exists():
+            fingerprinted_path.write_bytes(content)
+        assets[logical_url] = self._logical_url(fingerprinted_path)
+        return assets[logical_url]
+
+    def write_asset(self, logical_url: str, content: bytes) -> str:
+        """
+        Writes content under its fingerprinted name and returns the fingerprinted url
+        """
+        return self._write(self._assets, logical_url, content)
+
+    def write_build_asset(self, logical_url: str, content: bytes) -> str:
+        """
+        Like write_asset, for assets every build regenerates; they are recorded in the build manifest
+        """
+        # (manifests from before the split recorded them with the committed assets)
+        self._assets.pop(logical_url, None)
+        return self._write(self._build_assets, logical_url, content)
+
+    def fingerprint_file(self, path: Union[str, Path]) -> str:
+        """
+        Moves a file the build wrote into the static folder to its fingerprinted name; returns the fingerprinted url
+        """
+        path = Path(path)
+        fingerprinted_url = self.write_asset(self._logical_url(path), path.read_bytes())
+        path.unlink()
+        return fingerprinted_url
+
+    def merge(self, other: AssetManifest) -> None:
+        """
+        Adds the assets recorded in another copy of the manifest (i.e. one a build process wrote to)
+        """
+        self._assets.update(other._assets)
+        self._build_assets.update(other._build_assets)
+
+    def url_for(self, logical_url: str) -> Optional[str]:
+        return self._all_assets().get(logical_url)
+
+    def rewrite_references(self, value: Any) -> Any:
+        """
+        Returns value (e.g. a page's frontmatter) with every string that is a logical asset url
+        replaced by its fingerprinted url
+        """
+        if isinstance(value, str):
+            return self._build_assets.get(value, self._assets.get(value, value))
+        if isinstance(value, dict):
+            return {key: self.rewrite_references(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.rewrite_references(item) for item in value]
+        return value
+
+    def collect_garbage(self) -> List[Path]:
+        """
+        Deletes fingerprinted files left behind by older builds (in the folders the manifest knows
+        about) and forgets assets whose file is gone; returns the deleted paths
+        """
+        folder_paths = {self._static_path(url).parent for url in self._all_assets().values()}
+        self._assets = {logical_url: url for logical_url, url in self._assets.items() if self._static_path(url).exists()}
+        self._build_assets = {logical_url: url for logical_url, url in self._build_assets.items() if self._static_path(url).exists()}
+        current_paths = {self._static_path(url) for url in self._all_assets().values()}
+        deleted = []
+        for folder_path in folder_paths:
+            if not folder_path.exists():
+                continue
+            for path in folder_path.iterdir():
+                if _FINGERPRINTED_NAME.match(path.name) and path not in current_paths:
+                    path.unlink()
+                    deleted.append(path)
+        return deleted
+
+    def save(self) -> None:
+        for manifest_path, assets in [(self._manifest_path, self._assets), (self._build_manifest_path, self._build_assets)]:
+            manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(manifest_path, "w") as manifest_f:
+                json.dump(assets, manifest_f, indent=4, sort_keys=True)
+
+    def write_netlify_headers(self, headers_path: Path = NETLIFY_HEADERS_PATH) -> None:
+        """
+        Writes a netlify _headers file marking every fingerprinted asset as immutable
+        (the file is in the static folder so hugo copies it to the root of the published site)
+        """
+        lines = ["# generated by the site build (asset_fingerprinting.py); edits will be overwritten"]
+        for url in sorted(self._all_assets().values()):
+            lines.append(url)
+            lines.append(f"  Cache-Control: {IMMUTABLE_CACHE_CONTROL}")
+        headers_path.write_text("\n".join(lines) + "\n")
@@ -0,0 +1,126 @@
+"""
+Memory benchmark for the document model
+
+Builds a large synthetic google docs document and reports the resident memory (RSS) held after
+the document has been turned into sections, once with the old model (which kept the raw api
+paragraph elements around) and once with the compact model in classes.py.
+
+The old model is the baseline's classes.py and utils.py, kept in benchmark_fixtures/legacy_document_model.py.
+
+Run with: python benchmark_document_memory.py [number of entries]
+"""
+import gc
+import random
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+# holds the old DocumentSection / DocumentEntry
+LEGACY_MODEL_FOLDER_PATH = Path(__file__).resolve().parent.joinpath("benchmark_fixtures")
+
+SECTION_COUNT = 10
+PARAGRAPHS_PER_ENTRY = 8
+WORDS = ["train", "gelato", "museum", "cathedral", "beach", "hike", "tapas", "station", "castle", "market"]
+
+
+def make_synthetic_document(entry_count: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Returns a document shaped like the google docs api response, with entry_count day entries
+    """
+    rnd = random.Random(seed)
+
+    def paragraph(style: str, runs: List[Any]) -> Dict[str, Any]:
+        elements = []
+        for content, text_style in runs:
+            elements.append({"startIndex": 0, "endIndex": len(content),
+                             "textRun": {"content": content, "textStyle": text_style}})
+        return {"startIndex": 0, "endIndex": 0,
+                "paragraph": {"elements": elements,
+                              "paragraphStyle": {"namedStyleType": style, "direction": "LEFT_TO_RIGHT"}}}
+
+    def words(count: int) -> str:
+        return " ".join(rnd.choice(WORDS) for _ in range(count))
+
+    content = []
+    entries_per_section = max(1, entry_count // SECTION_COUNT)
+    for section_number in range(SECTION_COUNT):
+        content.append(paragraph("HEADING_1", [(f"Section {section_number}\n", {})]))
+        for entry_number in range(entries_per_section):
+            content.append(paragraph("HEADING_2", [(f"01-Jul-2022: Day {entry_number}\n", {})]))
+            for _ in range(PARAGRAPHS_PER_ENTRY):
+                content.append(paragraph("NORMAL_TEXT", [
+                    (words(25), {}),
+                    (words(3), {"bold": True}),
+                    (" ", {}),
+                    (words(2), {"link": {"url": "https://foursquare.com/v/5f009ab65b61c16c75cc514c"}}),
+                    (words(10) + "\n", {"italic": True}),
+                ]))
+    return {"body": {"content": content}}
+
+
+def current_rss_bytes() -> int:
+    # linux only, which is what netlify builds on
+    with open("/proc/self/statm") as statm_f:
+        resident_pages = int(statm_f.read().split()[1])
+    import resource
+    return resident_pages * resource.getpagesize()
+
+
+def release_free_memory() -> None:
+    # hand the pages freed by the raw document back to the os, otherwise RSS only shows the peak
+    import ctypes
+    ctypes.CDLL("libc.so.6").malloc_trim(0)
+
+
+def load_legacy_model(document) -> List[Any]:
+    """
+    Loads the document with the old model (see benchmark_fixtures/legacy_document_model.py)
+    """
+    sys.path.insert(0, str(LEGACY_MODEL_FOLDER_PATH))
+    from legacy_document_model import extract_document_sections
+    return extract_document_sections(document)
+
+
+def load_compact_model(document) -> List[Any]:
+    from utils import extract_document_sections
+    return extract_document_sections(document)
+
+
+def measure(model: str, entry_count: int) -> int:
+    """
+    Returns the RSS growth caused by holding the given model (the raw document is released first)
+    """
+    gc.collect()
+    rss_before = current_rss_bytes()
+    document = make_synthetic_document(entry_count)
+    if model == "legacy":
+        sections = load_legacy_model(document)
+    else:
+        sections = load_compact_model(document)
+    del document
+    gc.collect()
+    release_free_memory()
+    rss_after = current_rss_bytes()
+    assert sections
+    return rss_after - rss_before
+
+
+def main(entry_count: int) -> None:
+    print(f"synthetic document with {entry_count} entries of {PARAGRAPHS_PER_ENTRY} paragraphs")
+    results = {}
+    for model in ("legacy", "compact"):
+        # each model is measured in its own process so one doesn't pollute the other's heap
+        output = subprocess.run([sys.executable, __file__, "--measure", model, str(entry_count)],
+                                check=True, capture_output=True, text=True).stdout
+        results[model] = int(output.strip().splitlines()[-1])
+        print(f"{model:>8}: {results[model] / 2**20:8.1f} MiB RSS held after loading")
+    if results["compact"] > 0:
+        print(f"compact model uses {results['legacy'] / results['compact']:.1f}x less memory")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--measure":
+        print(measure(sys.argv[2], int(sys.argv[3])))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
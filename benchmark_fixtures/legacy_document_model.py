@@ -0,0 +1,293 @@
+# The document model as it was before the compact slotted model (the baseline's classes.py and utils.py),
+# kept verbatim so benchmark_document_memory.py can measure the old model without needing its git history;
+# only DocumentSection, DocumentEntry and the helpers extract_document_sections needs are kept
+from __future__ import annotations
+import datetime
+from typing import Any, List
+
+SECTION_STYLE_NAMED_STYLETYPE = "HEADING_1"
+ENTRY_STYLE_NAMED_STYLETYPE = "HEADING_2"
+
+
+class DocumentSection:
+    """
+    Represents things with a SECTION_STYLE_NAMED_STYLETYPE style and all content until the next SECTION_STYLE_NAMED_STYLETYPE
+    """
+    _id_counter = 0
+
+    # _text_elements is the document object text just under the section description
+    # _title_element is the title element of the object
+    # _document_entries is the entries of the days within a document
+    # _finalized --> once true, all of the mutators to the abstract value will fail (makes the object effectively immutable at runtime)
+
+    def __init__(self) -> None:
+        self._text_elements = []
+        self._document_entries: List[DocumentEntry] = []
+        self._title_element = None
+        self._finalized = False
+        self._section_id = None
+
+    def add_paragraph_element(self, element) -> None:
+        """
+        Adds a paragraph element to the description of the document section; shouldn't be called once finalized
+        """
+        if self._finalized:
+            raise ValueError("document section has already been finalized")
+        self._text_elements.append(element)
+
+    def add_document_entry(self, entry: DocumentEntry) -> None:
+        """
+        Adds a document entry to the DocumentSection; shouldn't be called once finalized
+        """
+        if self._finalized:
+            raise ValueError("document section has already been finalized")
+        self._document_entries.append(entry)
+
+    def add_title_element(self, element):
+        """
+        Adds the title paragraph element to the document
+        """
+        if self._finalized:
+            raise ValueError("document section has already been finalized")
+        if self._title_element is not None:
+            raise ValueError("document section has already had it's title element set")
+        self._title_element = element
+
+    def finalize(self):
+        """
+        Makes the object runtime immutable; useful for once the object has been fully initialized; should only be called once
+        """
+        if self._finalized == True:
+            raise ValueError("document section has already been finalized; shouldn't need to refinalize")
+        self._section_id = DocumentSection._id_counter
+        DocumentSection._id_counter += 1
+        self._finalized = True
+
+    def title_text(self) -> str:
+        return read_paragraph_elements(self._title_element).strip("\n")
+    
+    def title_text_elements(self) -> str:
+        return self._title_element.copy()
+
+    def entries(self) -> List[DocumentEntry]:
+        return self._document_entries.copy()
+
+    def get_description(self) -> List[str]:
+        out = []
+        for paragraph in self._text_elements:
+            out.append(read_paragraph_elements(paragraph))
+        return out
+
+    def get_description_elements(self) -> List[Any]:
+        return self._text_elements.copy()
+
+    @property
+    def section_id(self):
+        return self._section_id
+
+    def __eq__(self, __o: object) -> bool:
+        if isinstance(__o, DocumentSection):
+            return __o.section_id == self.section_id
+        return False
+
+    def __ne__(self, __o: object) -> bool:
+        return not (__o == self)
+    
+    def __hash__(self) -> int:
+        return self.section_id
+
+
+class DocumentEntry:
+    "Represents things with a ENTRY_STYLE_NAMED_STYLETYPE and all content until the next ENTRY_STYLE_NAMED_STYLETYPE"
+
+    DATE_STRING_LENGTH = 11 # number of characters that make up the date
+
+    def __init__(self) -> None:
+        self._text_elements = []
+        self._entry_title_element = None
+        self._finalized = False
+
+    def add_paragraph_element(self, element) -> None:
+        """
+        Adds a paragraph element to the description of the document entry; shouldn't be called once finalized
+        """
+        if self._finalized:
+            raise ValueError("document entry has already been finalized")
+        self._text_elements.append(element)
+
+    def add_entry_title_element(self, element):
+        """
+        Adds the title paragraph element to the entry; shouldnt be called once finalized
+        """
+        if self._finalized:
+            raise ValueError("document entry has already been finalized")
+        if self._entry_title_element is not None:
+            raise ValueError("document entry has already had it's title element set")
+        self._entry_title_element = element
+
+    def finalize(self):
+        """
+        Makes the object runtime immutable; useful for once the object has been fully initialized; should only be called once
+        """
+        if self._finalized == True:
+            raise ValueError("document entry has already been finalized; shouldn't need to refinalize")
+        self._finalized = True
+    
+    def _full_entry_title_text(self) -> str:
+        # Google api tends to include the newlines, so remove those
+        return read_paragraph_elements(self._entry_title_element).strip("\n")
+
+    def entry_title_text(self) -> str:
+        if self.has_date_in_title():
+            return self._full_entry_title_text()[DocumentEntry.DATE_STRING_LENGTH:].strip(": ")
+        else:
+            return self._full_entry_title_text()
+
+    def has_date_in_title(self) -> bool:
+        """
+        Hacky but works
+        """
+        try:
+            dt_format =  "%d-%b-%Y"
+            date_string = self._full_entry_title_text()[:DocumentEntry.DATE_STRING_LENGTH + 1].strip(": ")
+            date = datetime.datetime.strptime(date_string, dt_format).date()
+            return True
+        except:
+            return False
+
+
+    def entry_date(self) -> datetime.date:
+        dt_format =  "%d-%b-%Y"
+        date_string = self._full_entry_title_text()[:DocumentEntry.DATE_STRING_LENGTH + 1].strip(": ")
+
+        return datetime.datetime.strptime(date_string, dt_format).date()
+
+    def entry_title_text_elements(self) -> List[Any]:
+        return self._entry_title_element.copy()
+    
+    def get_paragraphs(self) -> List[str]:
+        out = []
+        for paragraph in self._text_elements:
+            out.append(read_paragraph_elements(paragraph))
+        return out
+    
+    def _get_paragraph_elements(self) -> List[Any]:
+        return self._text_elements.copy()
+
+    def get_markdown_content(self) -> str:
+        return "\n\n".join(map(lambda paragraph: paragraph_to_markdown(paragraph), self._get_paragraph_elements()))   
+
+
+def read_paragraph_element(element):
+    """Returns the text in the given ParagraphElement.
+
+        Args:
+            element: a ParagraphElement from a Google Doc.
+    """
+    text_run = element.get('textRun')
+    if not text_run:
+        return ''
+    return text_run.get('content')
+
+
+def extract_document_sections(document) -> List[DocumentSection]:
+    """
+    Splits the contents of the document into the information needed to extract the text
+    """
+    all_elements = document.get('body').get('content')
+    sections: List[DocumentSection] = []
+    next_section: DocumentSection = None
+    next_entry: DocumentEntry = None
+
+    for value in all_elements:
+        if 'paragraph' in value:
+            style = value['paragraph']['paragraphStyle']['namedStyleType']
+            elements = value.get('paragraph').get('elements')
+            is_bullet = 'bullet' in value.get('paragraph')
+            elements[0]["is_bullet"] = is_bullet # TODO this is stupid hack
+
+            if style == SECTION_STYLE_NAMED_STYLETYPE:
+                # style is a section: this means the previous section is done
+                if next_section is not None:
+                    sections.append(next_section)
+                    if next_entry is not None:
+                        next_entry.finalize()
+                        next_section.add_document_entry(next_entry)
+                        next_entry = None
+                    next_section.finalize()
+                next_section = DocumentSection()
+                next_section.add_title_element(elements)
+            elif style == ENTRY_STYLE_NAMED_STYLETYPE:
+                # we are a a new entry, but not a new section
+                if next_entry is not None:
+                    next_entry.finalize()
+                    next_section.add_document_entry(next_entry)
+                next_entry = DocumentEntry()
+                next_entry.add_entry_title_element(elements)
+
+            else:
+                if next_entry is not None:
+                    next_entry.add_paragraph_element(elements)
+                elif next_section is not None:
+                    next_section.add_paragraph_element(elements)
+                else:
+                    print("somewhere there is a paragraph not in a section START OF ELEM\n", read_paragraph_elements(elements), "\n END OF ELEM")
+
+    if next_section is not None:
+        sections.append(next_section)
+        if next_entry is not None:
+            next_entry.finalize()
+            next_section.add_document_entry(next_entry)
+        next_section.finalize()
+
+    return sections
+
+
+def paragraph_to_markdown(paragraph_elements) -> str:
+    is_bullet = paragraph_elements[0]['is_bullet']
+    if is_bullet:
+        output = "- "
+    else:
+        output = ""
+
+    for element in paragraph_elements:
+        text_run = element.get('textRun')
+        if text_run:
+            is_bold = 'bold' in text_run.get('textStyle') and text_run.get('textStyle').get('bold')
+            is_italic = 'italic' in text_run.get('textStyle') and text_run.get('textStyle').get('italic')
+            is_link = 'link' in text_run.get('textStyle') and "url" in text_run.get('textStyle').get('link')
+            if is_link:
+                url_link = text_run.get('textStyle').get('link').get('url')
+
+            # special case for handling google empty format sections
+            # as it doesn't convert to markdown nicely
+            if text_run.get('content').strip("\n") == "":
+                continue
+
+            # enclose opening
+            if is_link:
+                output += "["
+            if is_italic:
+                output += "*"
+            if is_bold:
+                output += "**"
+            
+            # add in the actual text
+            output += text_run.get('content').strip("\n")
+
+            # enclose closing
+            if is_bold:
+                output += "**"
+            if is_italic:
+                output += "*"
+            if is_link:
+                output += "](" + url_link + ")"
+
+    return output
+
+
+def read_paragraph_elements(elements):
+    output = ""
+    for element in elements:
+        output += read_paragraph_element(element)
+    return output
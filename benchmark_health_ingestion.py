@@ -0,0 +1,87 @@
+"""
+Benchmark for streaming Apple Health exports (ingest_health_data.py)
+
+Writes a synthetic export.xml of the given size (records spread over the trip, with the nested
+metadata elements real exports have), then ingests it, reporting the throughput and the peak RSS,
+which should stay flat however large the export is.
+
+Run with: python benchmark_health_ingestion.py [gigabytes, default 2] [export path]
+"""
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from ingest_health_data import DailyHealthTotals, ingest_apple_health_export
+from trips import TripConfig
+
+EXPORT_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE HealthData [
+<!ELEMENT HealthData (ExportDate,Me,(Record|Correlation|Workout|ActivitySummary)*)>
+<!ATTLIST HealthData locale CDATA #REQUIRED>
+]>
+<HealthData locale="en_US">
+ <ExportDate value="2022-09-01 10:00:00 -0700"/>
+ <Me HKCharacteristicTypeIdentifierDateOfBirth=""/>
+"""
+
+RECORD_TEMPLATES = [
+    ' <Record type="HKQuantityTypeIdentifierStepCount" sourceName="Benton\'s Apple Watch" sourceVersion="8.7" unit="count" creationDate="{day} {time} +0200" startDate="{day} {time} +0200" endDate="{day} {time} +0200" value="{count}">\n'
+    '  <MetadataEntry key="HKMetadataKeySyncVersion" value="1"/>\n </Record>\n',
+    ' <Record type="HKQuantityTypeIdentifierDistanceWalkingRunning" sourceName="Benton\'s Apple Watch" sourceVersion="8.7" unit="mi" creationDate="{day} {time} +0200" startDate="{day} {time} +0200" endDate="{day} {time} +0200" value="0.0{count}"/>\n',
+    ' <Record type="HKQuantityTypeIdentifierActiveEnergyBurned" sourceName="Benton\'s Apple Watch" sourceVersion="8.7" unit="kcal" creationDate="{day} {time} +0200" startDate="{day} {time} +0200" endDate="{day} {time} +0200" value="0.{count}"/>\n',
+    ' <Record type="HKQuantityTypeIdentifierHeartRate" sourceName="Benton\'s Apple Watch" sourceVersion="8.7" unit="count/min" creationDate="{day} {time} +0200" startDate="{day} {time} +0200" endDate="{day} {time} +0200" value="7{count}">\n'
+    '  <MetadataEntry key="HKMetadataKeyHeartRateMotionContext" value="0"/>\n </Record>\n',
+]
+
+
+def write_synthetic_export(export_path: Path, target_bytes: int, seed: int = 0) -> int:
+    """
+    Writes records until the file is target_bytes long; returns the number of records written
+    """
+    rnd = random.Random(seed)
+    days = [f"2022-07-{day:02d}" for day in range(1, 32)]
+    record_count = 0
+    written = 0
+    with open(export_path, "w") as export_f:
+        export_f.write(EXPORT_HEADER)
+        while written < target_bytes:
+            # write in batches, formatting a record at a time is what makes this slow
+            batch = "".join(rnd.choice(RECORD_TEMPLATES).format(day=rnd.choice(days),
+                                                               time=f"{rnd.randrange(24):02d}:{rnd.randrange(60):02d}:00",
+                                                               count=rnd.randrange(10, 99))
+                            for _ in range(10000))
+            export_f.write(batch)
+            written += len(batch)
+            record_count += 10000
+        export_f.write("</HealthData>\n")
+    return record_count
+
+
+def main(gigabytes: float, export_path: Path) -> None:
+    target_bytes = int(gigabytes * 2**30)
+    if not export_path.exists() or export_path.stat().st_size < target_bytes:
+        print(f"writing a {gigabytes} GB synthetic export to {export_path}")
+        write_synthetic_export(export_path, target_bytes)
+    size = export_path.stat().st_size
+
+    trip = TripConfig("benchmark", "Benchmark", "", "", "", "", "2022-06-20", "2022-08-31")
+    totals = DailyHealthTotals(trip)
+    start_time = time.monotonic()
+    record_count = ingest_apple_health_export(export_path, "bb", totals)
+    seconds = time.monotonic() - start_time
+
+    # ru_maxrss is in kilobytes on linux
+    peak_rss_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"ingested {size / 2**30:.2f} GB ({record_count:,} records) in {seconds:.1f}s: "
+          f"{size / 2**20 / seconds:.0f} MB/s, {record_count / seconds:,.0f} records/s")
+    print(f"peak RSS: {peak_rss_mib:.0f} MiB for {len(totals.rounded())} days")
+
+
+if __name__ == "__main__":
+    gigabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    export_path = Path(sys.argv[2]) if len(sys.argv) > 2 else Path(tempfile.gettempdir()).joinpath("synthetic_export.xml")
+    main(gigabytes, export_path)
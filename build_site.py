@@ -1,51 +1,87 @@
 """
 This is the script that builds the content for the hugo to run
 After running this script, running hugo should build the static website
+
+Every trip in site_building_data/trips.json is built: the data for all the trips is fetched
+concurrently (sharing one http client and the on disk image cache), then the trips are built
+concurrently in a process pool
+
+A scoped (preview) build only builds some sections and/or days, loading only the data those need,
+and leaves the rest of the content folder as it is:
+    python build_site.py --section France --from 2022-07-14 --to 2022-07-16
 """
 
-from classes import MiscellanySectionBuilder, SmugMugImageData, SwarmCheckinData, WebContentBuilder, SearchSectionBuilder, MiscellanySectionBuilder, OverviewSectionBuilder
+from classes import SearchSectionBuilder, WebContentBuilder
+import argparse
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from http_client import HttpClient
+
+from trips import BuildScope, load_trip_configs, fetch_trip_data, make_content_builder
+from date_normalization import DATE_STRING_FORMAT, parse_date
+from size_report import load_size_budgets
+from asset_fingerprinting import AssetManifest
+from content_manifest import write_manifest as write_content_manifest
 
 CONTENT_FOLDER_PATH = Path("./content")
-if CONTENT_FOLDER_PATH.exists():
-    raise RuntimeError("run \"rm -r content/\" to delete the content folder before running this script; this prevents accidentally manually overriding edits to content")
-
-from utils import make_google_api_request, extract_document_sections
-from cleaning_swarm_checkins import clean_swarm_data
-# Google docs log data
-document = make_google_api_request()
-document_sections = extract_document_sections(document)
-
-# Smugmug data
-image_data = SmugMugImageData()
-
-# Checkin data
-checkin_data = SwarmCheckinData(clean_swarm_data())
-
-# Health data
-import json
-HEALTH_DATA_PATH = "./site_building_data/europe_health.json"
-with open(HEALTH_DATA_PATH, "r") as health_data_f:
-    all_health_data = json.load(health_data_f)
-
-content_builder= WebContentBuilder(image_data, checkin_data, all_health_data, document_sections)
-
-# Search section needs to be built
-content_builder.set_special_section(
-    section_key="search",
-    section_builder_type=SearchSectionBuilder,
-)
-
-# Miscellany Section is last maybe don't hardcode this but for now its fine
-content_builder.set_special_section(
-    section_key=document_sections[-1],
-    section_builder_type=MiscellanySectionBuilder
-)
-
-# The Overview Section Also needs to be handled seperately, and it is the first section
-content_builder.set_special_section(
-    section_key=document_sections[0],
-    section_builder_type=OverviewSectionBuilder
-)
-
-content_builder.build_content()
\ No newline at end of file
+
+
+def iso_date(date_text: str) -> str:
+    # validates the date, keeping the "%Y-%m-%d" string
+    return parse_date(date_text, DATE_STRING_FORMAT).strftime(DATE_STRING_FORMAT)
+
+
+# the guard keeps the trip build processes from rerunning the script when they start
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="builds the content folder for hugo")
+    parser.add_argument("--section", action="append", dest="sections", metavar="TITLE",
+                        help="only build the section with this title (can be given more than once)")
+    parser.add_argument("--from", dest="start_date", type=iso_date, metavar="YYYY-MM-DD",
+                        help="only build the day entries from this date")
+    parser.add_argument("--to", dest="end_date", type=iso_date, metavar="YYYY-MM-DD",
+                        help="only build the day entries up to (and including) this date")
+    parser.add_argument("--trip", action="append", dest="trips", metavar="NAME",
+                        help="only build the trip with this name in trips.json (can be given more than once)")
+    args = parser.parse_args()
+
+    scope = None
+    if args.sections or args.start_date or args.end_date:
+        scope = BuildScope(args.sections, args.start_date, args.end_date)
+    elif CONTENT_FOLDER_PATH.exists():
+        raise RuntimeError("run \"rm -r content/\" to delete the content folder before running this script; this prevents accidentally manually overriding edits to content")
+
+    trips = load_trip_configs()
+    if args.trips:
+        trips = [trip for trip in trips if trip.name in args.trips]
+        if not trips:
+            raise ValueError(f"no trips named {args.trips} in trips.json")
+
+    # Google docs log, smugmug, checkin and health data for every trip (only what the scope needs, for a scoped build)
+    with HttpClient() as client, ThreadPoolExecutor() as pool:
+        all_trip_data = list(pool.map(lambda trip: fetch_trip_data(trip, client, scope), trips))
+        print("http requests made while fetching:")
+        print(client.format_metrics())
+
+    if scope is not None:
+        scope.check_matches([document_section for trip_data in all_trip_data for document_section in trip_data.document_sections])
+
+    size_budgets = load_size_budgets()
+    # generated assets (i.e. the mapbox images) are referenced by their fingerprinted urls
+    asset_manifest = AssetManifest()
+    content_builders = [make_content_builder(trip_data, size_budgets, asset_manifest, scope) for trip_data in all_trip_data]
+
+    # Search section needs to be built (once, for the whole site; scoped builds skip it)
+    content_builders[0].set_special_section(
+        section_key="search",
+        section_builder_type=SearchSectionBuilder,
+    )
+
+    WebContentBuilder.build_trips(content_builders)
+
+    # drop fingerprints from older builds, and let netlify cache the current ones forever
+    asset_manifest.collect_garbage()
+    asset_manifest.save()
+    asset_manifest.write_netlify_headers()
+
+    # manifest of the generated content, to diff against other builds (see content_manifest.py)
+    write_content_manifest(CONTENT_FOLDER_PATH)
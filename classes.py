@@ -3,30 +3,117 @@
 # Class should contain something about imageData
 
 from __future__ import annotations
-from ctypes import Union
 from email.mime import image
 from re import I
-from typing import Any, Dict, List, Optional, Type
-from smugmug_api import get_smugmug_data
+import itertools
+import re
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
+from smugmug_api import get_smugmug_data, DEFAULT_ALBUM_KEY
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from http_client import HttpClient
 import datetime
-from utils import read_paragraph_elements, paragraph_to_markdown, dict_to_frontmatter_string
+from utils import frontmatter_field_strings, frontmatter_fields_to_string
+from size_report import ContentSizeReport
+from trips import BuildScope, TripConfig
+from asset_fingerprinting import AssetManifest
+from date_normalization import parse_date
+from image_index import IMAGE_INDEX_FOLDER_PATH
+from static_maps import render_checkin_map
+
+class StyleRun:
+    """
+    One run of text sharing a single style (the compact form of a google docs textRun)
+    """
+    __slots__ = ("text", "bold", "italic", "link")
+
+    def __init__(self, text: str, bold: bool = False, italic: bool = False, link: Optional[str] = None) -> None:
+        # runs repeat a lot of the same small strings ("\n", ": ", urls), so intern them
+        # the text is reallocated (not referenced) because the api's strings sit in the same allocator
+        # pools as the rest of the raw response, and keeping them would keep those pools from being
+        # freed once the response is dropped (benchmark_document_memory.py: ~200 MiB with, ~770 without)
+        self.text = sys.intern(text.encode().decode())
+        self.bold = bold
+        self.italic = italic
+        self.link = sys.intern(link) if link is not None else None
+
+    @classmethod
+    def from_element(cls, element) -> Optional[StyleRun]:
+        """
+        Converts a google docs ParagraphElement to a StyleRun; returns None for elements without text
+        """
+        text_run = element.get('textRun')
+        if not text_run:
+            return None
+        text_style = text_run.get('textStyle', {})
+        link = text_style.get('link', {}).get('url') if 'link' in text_style else None
+        return cls(text_run.get('content'),
+                   bold=bool(text_style.get('bold')),
+                   italic=bool(text_style.get('italic')),
+                   link=link)
+
+    def to_markdown(self) -> str:
+        # special case for handling google empty format sections
+        # as it doesn't convert to markdown nicely
+        text = self.text.strip("\n")
+        if text == "":
+            return ""
+
+        if self.bold:
+            text = "**" + text + "**"
+        if self.italic:
+            text = "*" + text + "*"
+        if self.link is not None:
+            text = "[" + text + "](" + self.link + ")"
+        return text
+
+
+class DocumentParagraph:
+    """
+    A paragraph of the document: the style runs it is made of and whether it is a bullet point
+    """
+    __slots__ = ("runs", "is_bullet")
+
+    def __init__(self, runs: Tuple[StyleRun, ...], is_bullet: bool = False) -> None:
+        self.runs = runs
+        self.is_bullet = is_bullet
+
+    @classmethod
+    def from_elements(cls, paragraph_elements) -> DocumentParagraph:
+        """
+        Converts a list of google docs ParagraphElements; nothing from the raw json is referenced afterwards
+        """
+        runs = tuple(run for run in map(StyleRun.from_element, paragraph_elements) if run is not None)
+        is_bullet = bool(paragraph_elements[0].get("is_bullet", False)) if paragraph_elements else False
+        return cls(runs, is_bullet)
+
+    def text(self) -> str:
+        return "".join(run.text for run in self.runs)
+
+    def to_markdown(self) -> str:
+        output = "- " if self.is_bullet else ""
+        return output + "".join(run.to_markdown() for run in self.runs)
+
 
 class DocumentSection:
     """
     Represents things with a SECTION_STYLE_NAMED_STYLETYPE style and all content until the next SECTION_STYLE_NAMED_STYLETYPE
     """
-    _id_counter = 0
+    __slots__ = ("_paragraphs", "_document_entries", "_title", "_finalized", "_section_id")
+    # next() on an itertools.count is atomic, so sections extracted in several threads at once get distinct ids
+    _ids = itertools.count()
 
-    # _text_elements is the document object text just under the section description
-    # _title_element is the title element of the object
+    # _paragraphs is the document text just under the section description
+    # _title is the title paragraph of the object
     # _document_entries is the entries of the days within a document
     # _finalized --> once true, all of the mutators to the abstract value will fail (makes the object effectively immutable at runtime)
+    # the paragraph and entry lists are turned into tuples on finalize, so the accessors don't need to copy them
 
     def __init__(self) -> None:
-        self._text_elements = []
-        self._document_entries: List[DocumentEntry] = []
-        self._title_element = None
+        self._paragraphs: Union[List[DocumentParagraph], Tuple[DocumentParagraph, ...]] = []
+        self._document_entries: Union[List[DocumentEntry], Tuple[DocumentEntry, ...]] = []
+        self._title: Optional[DocumentParagraph] = None
         self._finalized = False
         self._section_id = None
 
@@ -36,7 +123,7 @@ class DocumentSection:
         """
         if self._finalized:
             raise ValueError("document section has already been finalized")
-        self._text_elements.append(element)
+        self._paragraphs.append(DocumentParagraph.from_elements(element))
 
     def add_document_entry(self, entry: DocumentEntry) -> None:
         """
@@ -52,9 +139,9 @@ class DocumentSection:
         """
         if self._finalized:
             raise ValueError("document section has already been finalized")
-        if self._title_element is not None:
+        if self._title is not None:
             raise ValueError("document section has already had it's title element set")
-        self._title_element = element
+        self._title = DocumentParagraph.from_elements(element)
 
     def finalize(self):
         """
@@ -62,27 +149,25 @@ class DocumentSection:
         """
         if self._finalized == True:
             raise ValueError("document section has already been finalized; shouldn't need to refinalize")
-        self._section_id = DocumentSection._id_counter
-        DocumentSection._id_counter += 1
+        self._section_id = next(DocumentSection._ids)
+        self._paragraphs = tuple(self._paragraphs)
+        self._document_entries = tuple(self._document_entries)
         self._finalized = True
 
     def title_text(self) -> str:
-        return read_paragraph_elements(self._title_element).strip("\n")
+        return self._title.text().strip("\n")
     
-    def title_text_elements(self) -> str:
-        return self._title_element.copy()
+    def title_text_elements(self) -> Tuple[StyleRun, ...]:
+        return self._title.runs
 
-    def entries(self) -> List[DocumentEntry]:
-        return self._document_entries.copy()
+    def entries(self) -> Tuple[DocumentEntry, ...]:
+        return tuple(self._document_entries)
 
     def get_description(self) -> List[str]:
-        out = []
-        for paragraph in self._text_elements:
-            out.append(read_paragraph_elements(paragraph))
-        return out
+        return [paragraph.text() for paragraph in self._paragraphs]
 
-    def get_description_elements(self) -> List[Any]:
-        return self._text_elements.copy()
+    def get_description_elements(self) -> Tuple[DocumentParagraph, ...]:
+        return tuple(self._paragraphs)
 
     @property
     def section_id(self):
@@ -102,12 +187,13 @@ class DocumentSection:
 
 class DocumentEntry:
     "Represents things with a ENTRY_STYLE_NAMED_STYLETYPE and all content until the next ENTRY_STYLE_NAMED_STYLETYPE"
+    __slots__ = ("_paragraphs", "_entry_title", "_finalized")
 
     DATE_STRING_LENGTH = 11 # number of characters that make up the date
 
     def __init__(self) -> None:
-        self._text_elements = []
-        self._entry_title_element = None
+        self._paragraphs: Union[List[DocumentParagraph], Tuple[DocumentParagraph, ...]] = []
+        self._entry_title: Optional[DocumentParagraph] = None
         self._finalized = False
 
     def add_paragraph_element(self, element) -> None:
@@ -116,7 +202,7 @@ class DocumentEntry:
         """
         if self._finalized:
             raise ValueError("document entry has already been finalized")
-        self._text_elements.append(element)
+        self._paragraphs.append(DocumentParagraph.from_elements(element))
 
     def add_entry_title_element(self, element):
         """
@@ -124,9 +210,9 @@ class DocumentEntry:
         """
         if self._finalized:
             raise ValueError("document entry has already been finalized")
-        if self._entry_title_element is not None:
+        if self._entry_title is not None:
             raise ValueError("document entry has already had it's title element set")
-        self._entry_title_element = element
+        self._entry_title = DocumentParagraph.from_elements(element)
 
     def finalize(self):
         """
@@ -134,11 +220,12 @@ class DocumentEntry:
         """
         if self._finalized == True:
             raise ValueError("document entry has already been finalized; shouldn't need to refinalize")
+        self._paragraphs = tuple(self._paragraphs)
         self._finalized = True
     
     def _full_entry_title_text(self) -> str:
         # Google api tends to include the newlines, so remove those
-        return read_paragraph_elements(self._entry_title_element).strip("\n")
+        return self._entry_title.text().strip("\n")
 
     def entry_title_text(self) -> str:
         if self.has_date_in_title():
@@ -151,9 +238,7 @@ class DocumentEntry:
         Hacky but works
         """
         try:
-            dt_format =  "%d-%b-%Y"
-            date_string = self._full_entry_title_text()[:DocumentEntry.DATE_STRING_LENGTH + 1].strip(": ")
-            date = datetime.datetime.strptime(date_string, dt_format).date()
+            self.entry_date()
             return True
         except:
             return False
@@ -163,22 +248,19 @@ class DocumentEntry:
         dt_format =  "%d-%b-%Y"
         date_string = self._full_entry_title_text()[:DocumentEntry.DATE_STRING_LENGTH + 1].strip(": ")
 
-        return datetime.datetime.strptime(date_string, dt_format).date()
+        return parse_date(date_string, dt_format)
 
-    def entry_title_text_elements(self) -> List[Any]:
-        return self._entry_title_element.copy()
+    def entry_title_text_elements(self) -> Tuple[StyleRun, ...]:
+        return self._entry_title.runs
     
     def get_paragraphs(self) -> List[str]:
-        out = []
-        for paragraph in self._text_elements:
-            out.append(read_paragraph_elements(paragraph))
-        return out
+        return [paragraph.text() for paragraph in self._paragraphs]
     
-    def _get_paragraph_elements(self) -> List[Any]:
-        return self._text_elements.copy()
+    def _get_paragraph_elements(self) -> Tuple[DocumentParagraph, ...]:
+        return tuple(self._paragraphs)
 
     def get_markdown_content(self) -> str:
-        return "\n\n".join(map(lambda paragraph: paragraph_to_markdown(paragraph), self._get_paragraph_elements()))   
+        return "\n\n".join(paragraph.to_markdown() for paragraph in self._paragraphs)
 
 
 class SmugMugImageData:
@@ -186,14 +268,21 @@ class SmugMugImageData:
     Tiny class representing smugmug image data
     """
 
-    def __init__(self):
+    def __init__(self, album_key: str = DEFAULT_ALBUM_KEY, client: Optional[HttpClient] = None,
+                       include_date: Optional[Callable[[str], bool]] = None, *,
+                       clock_shift_seconds: int, date_overrides: Dict[str, str]):
         """
         Makes a call to the smugmug api to initialize the class
+        include_date keeps only the images on matching days
+        clock_shift_seconds and date_overrides correct the dates of the album's images (see trips.json)
         """
-        favs_out, all_out, key_to_metadata = get_smugmug_data()
+        favs_out, all_out, key_to_metadata, image_index = get_smugmug_data(album_key, client, include_date,
+                                                                           clock_shift_seconds=clock_shift_seconds,
+                                                                           date_overrides=date_overrides)
         self.favs_out = favs_out
         self.image_date_to_key = all_out
         self.key_to_metadata = key_to_metadata
+        self.index = image_index
 
 class SwarmCheckinData:
     """
@@ -203,17 +292,44 @@ class SwarmCheckinData:
         self.checkin_data = swarm_data_cleaned
 
 
+def image_frontmatter(image_metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the frontmatter entry used by the figure partial for one image's metadata
+    """
+    image_entry = {"largestUri": image_metadata["largest_uri"],
+                   "thumbnailUri": image_metadata["thumbnail_uri"],
+                   "largewidth": int(image_metadata["largewidth"]),
+                   "largeheight": int(image_metadata["largeheight"]),
+                   "titlestr": image_metadata["title"],
+                   "captionstr": image_metadata["caption"]}
+    # only there when the image processing stage has run on the metadata
+    if "placeholder" in image_metadata:
+        image_entry["placeholder"] = image_metadata["placeholder"]
+        image_entry["dominantColor"] = image_metadata["dominant_color"]
+        image_entry["thumbwidth"] = int(image_metadata["thumbnail_width"])
+        image_entry["thumbheight"] = int(image_metadata["thumbnail_height"])
+    return image_entry
+
+
 class WebSectionBuilder:
     """
     Maybe this is something that takes in a section, a type (or some other parameter), and the writes the data to it
     """
     def __init__(self, image_data: SmugMugImageData,
                        checkin_data: SwarmCheckinData,
-                       health_data: Dict[str, Any]) -> None:
+                       health_data: Dict[str, Any],
+                       size_report: Optional[ContentSizeReport] = None,
+                       trip: Optional[TripConfig] = None,
+                       asset_manifest: Optional[AssetManifest] = None,
+                       scope: Optional[BuildScope] = None) -> None:
         self._document_section: Optional[DocumentSection] = None
         self._image_data = image_data
         self._health_data = health_data
         self._checkin_data = checkin_data
+        self._size_report = size_report
+        self._trip = trip
+        self._asset_manifest = asset_manifest
+        self._scope = scope # None for a full build
 
     def add_document_section(self, document_section: DocumentSection) -> None:
         """
@@ -221,6 +337,20 @@ class WebSectionBuilder:
         """
         self._document_section = document_section
 
+    def _write_content_file(self, path: Path, frontmatter: Dict[str, Any], body: str = "") -> None:
+        """
+        Writes a content file (frontmatter then markdown body), recording its size in the size report
+        References to generated assets in the frontmatter are rewritten to their fingerprinted urls
+        """
+        if self._asset_manifest is not None:
+            frontmatter = self._asset_manifest.rewrite_references(frontmatter)
+        field_strings = frontmatter_field_strings(frontmatter)
+        with open(path, "w") as f:
+            f.write(frontmatter_fields_to_string(field_strings))
+            f.write(body)
+        if self._size_report is not None:
+            self._size_report.record(path, field_strings, body, image_references=len(frontmatter.get("images", [])))
+
     def run_section_build(self) -> None:
         """
         Actually outputs the section to the content folder
@@ -230,30 +360,47 @@ class WebSectionBuilder:
         
         section_folder_path = self.section_parent_path.joinpath(
             self._document_section.title_text())
-        section_folder_path.mkdir()
-
-        section_index_frontmatter = {
-            "draft" : False,
-            "title" : self._document_section.title_text()
-        }
+        # scoped builds add to (or update) what is already there
+        section_folder_path.mkdir(exist_ok=self._scope is not None)
+
+        # the index summarises every day of the section, so a scoped build only rewrites it when it has all of them
+        section_index_path = section_folder_path.joinpath("_index.md")
+        whole_section = self._scope is None or self._scope.includes_whole_section(self._document_section)
+        if not whole_section and not section_index_path.exists():
+            # the tags and map of only the scoped days would be wrong for the section, so they are left
+            # out until a build covers the whole section
+            self._write_content_file(section_index_path, {
+                "draft" : False,
+                "title" : self._document_section.title_text()
+            })
+        elif whole_section:
+            section_index_frontmatter = {
+                "draft" : False,
+                "title" : self._document_section.title_text()
+            }
+            entry_dates = [entry.entry_date().strftime("%Y-%m-%d") for entry in self._document_section.entries()]
+            section_keywords = self._image_data.index.section_keywords(self._document_section.title_text())
+            if section_keywords:
+                section_index_frontmatter["tags"] = section_keywords
+            section_checkins = [checkin for date in entry_dates
+                                for checkin in self._checkin_data.checkin_data.get(date, {}).get("all", [])]
+            section_map_url = self._write_checkin_map("section-" + map_slug(self._document_section.title_text()), section_checkins)
+            if section_map_url is not None:
+                section_index_frontmatter["mapSvg"] = section_map_url
 
-        with open(section_folder_path.joinpath("_index.md"), "w") as index_f:
-            index_f.write(dict_to_frontmatter_string(section_index_frontmatter))
+            self._write_content_file(section_index_path, section_index_frontmatter)
 
 
         image_date_to_key = self._image_data.image_date_to_key
         image_key_to_metadata = self._image_data.key_to_metadata
         for entry in self._document_section.entries():
             date_string = entry.entry_date().strftime("%Y-%m-%d")
+            if self._scope is not None and not self._scope.includes_date(date_string):
+                continue
             images_data = []
             if date_string in image_date_to_key:
                 for image_key in image_date_to_key[date_string]:
-                    images_data.append({"largestUri": image_key_to_metadata[image_key]["largest_uri"],
-                                       "thumbnailUri": image_key_to_metadata[image_key]["thumbnail_uri"],
-                                       "largewidth": int(image_key_to_metadata[image_key]["largewidth"]),
-                                       "largeheight": int(image_key_to_metadata[image_key]["largeheight"]),
-                                       "titlestr": image_key_to_metadata[image_key]["title"],
-                                       "captionstr": image_key_to_metadata[image_key]["caption"]})
+                    images_data.append(image_frontmatter(image_key_to_metadata[image_key]))
 
             frontmatter = {
                 "draft": False,
@@ -263,11 +410,40 @@ class WebSectionBuilder:
                 "healthData": self._health_data[date_string],
                 "checkin_data": self._checkin_data.checkin_data[date_string]
             }
+            # hugo makes the /tags/ pages from these
+            day_keywords = self._image_data.index.keywords_on(date_string)
+            if day_keywords:
+                frontmatter["tags"] = day_keywords
+            map_image_url = f"/mapbox/mapbox-{date_string}.png"
+            if self._asset_manifest is not None and self._asset_manifest.url_for(map_image_url) is not None:
+                frontmatter["mapImage"] = map_image_url
+            day_map_url = self._write_checkin_map("day-" + date_string, self._checkin_data.checkin_data[date_string]["all"])
+            if day_map_url is not None:
+                frontmatter["mapSvg"] = day_map_url
+
+            markdown_content = entry.get_markdown_content()
+            self._write_content_file(section_folder_path.joinpath(date_string + ".md"), frontmatter, markdown_content)
+
+    def _write_checkin_map(self, map_name: str, checkins: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Writes the static svg map of the checkins as a generated asset and returns its url; None if
+        there is nothing to draw or no asset manifest to record it in
+        """
+        if self._asset_manifest is None or not checkins:
+            return None
+        trip_folder = self._trip.name + "/" if self._trip is not None else ""
+        map_url = f"/maps/{trip_folder}{map_name}.svg"
+        self._asset_manifest.write_build_asset(map_url, render_checkin_map(checkins).encode("utf-8"))
+        return map_url
 
-            with open(section_folder_path.joinpath(date_string + ".md"), "w") as f:
-                f.write(dict_to_frontmatter_string(frontmatter))
-                markdown_content = entry.get_markdown_content()
-                f.write(markdown_content)
+    @property
+    def content_folder_path(self) -> Path:
+        """
+        The folder the trip is built into: /content itself, or the trip's subtree of it
+        """
+        if self._trip is None:
+            return WebContentBuilder.CONTENT_FOLDER_PATH
+        return WebContentBuilder.CONTENT_FOLDER_PATH.joinpath(self._trip.output_subtree)
 
     @property
     def section_parent_path(self):
@@ -275,27 +451,97 @@ class WebSectionBuilder:
         Gets the folder withing the /content directory that this section folder should go inside
         i.e. content/post/
         """
-        parent_path = WebContentBuilder.CONTENT_FOLDER_PATH.joinpath("post/")
+        parent_path = self.content_folder_path.joinpath("post/")
         if not parent_path.exists():
-            parent_path.mkdir()
+            parent_path.mkdir(parents=True)
 
         return parent_path
 
 
+def map_slug(title: str) -> str:
+    # "Spain & Portugal" => spain-portugal
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-") or "section"
+
+
 class SearchSectionBuilder(WebSectionBuilder):
 
     def add_document_section(self, document_section: DocumentSection) -> None:
         raise RuntimeError("A document section was added to the search section builder; this shouldn't happen")
 
     def run_section_build(self) -> None:
-        with open(WebContentBuilder.CONTENT_FOLDER_PATH.joinpath("search.md"), "w") as search_f:
-            search_frontmatter = {
-                "title": "Search", # in any language you want
-                "layout": "search", # is necessary
-                "summary": "search page",
-                "placeholder": "search for content here",
-            }
-            search_f.write(dict_to_frontmatter_string(search_frontmatter))
+        search_frontmatter = {
+            "title": "Search", # in any language you want
+            "layout": "search", # is necessary
+            "summary": "search page",
+            "placeholder": "search for content here",
+        }
+        self._write_content_file(WebContentBuilder.CONTENT_FOLDER_PATH.joinpath("search.md"), search_frontmatter)
+
+
+class PhotosSectionBuilder(WebSectionBuilder):
+    """
+    Builds the photo galleries (favorites, and one per keyword) from the image index, and writes the
+    index itself to data/image_index/ for hugo
+    """
+
+    def add_document_section(self, document_section: DocumentSection) -> None:
+        raise RuntimeError("A document section was added to the photos section builder; this shouldn't happen")
+
+    def _gallery_frontmatter(self, title: str, image_keys: List[str]) -> Dict[str, Any]:
+        image_key_to_metadata = self._image_data.key_to_metadata
+        return {
+            "draft": False,
+            "title": title,
+            "layout": "photo_gallery",
+            "images": [image_frontmatter(image_key_to_metadata[image_key]) for image_key in image_keys],
+        }
+
+    def run_section_build(self) -> None:
+        image_index = self._image_data.index
+        trip_name = self._trip.name if self._trip is not None else "default"
+        image_index.write(IMAGE_INDEX_FOLDER_PATH.joinpath(trip_name + ".json"))
+
+        favorites = image_index.favorites()
+        if not favorites and not image_index.keywords:
+            return
+
+        section_folder_path = self.content_folder_path.joinpath("photos")
+        section_folder_path.mkdir(parents=True)
+        # the menu entry comes with the section, so it only exists (and points at the trip's subtree) when the section does
+        menu_name = "Photos" if self._trip is None or self._trip.output_subtree == "" else f"{self._trip.title} Photos"
+        section_index_frontmatter = {
+            "draft": False,
+            "title": "Photos",
+            "menu": {"main": {"name": menu_name, "weight": 10}},
+        }
+        self._write_content_file(section_folder_path.joinpath("_index.md"), section_index_frontmatter)
+
+        if favorites:
+            self._write_content_file(section_folder_path.joinpath("favorites.md"),
+                                     self._gallery_frontmatter("Favorites", favorites))
+        for keyword, slug in keyword_slugs(image_index.keywords).items():
+            self._write_content_file(section_folder_path.joinpath(slug + ".md"),
+                                     self._gallery_frontmatter(keyword.title(), image_index.keys_for_keyword(keyword)))
+
+
+def keyword_slugs(keywords: List[str]) -> Dict[str, str]:
+    """
+    Returns keyword => the name of its gallery page, unique across the keywords
+    ("food & drink" and "food-drink" would both be food-drink, so the second becomes food-drink-2)
+    """
+    # index.md would turn the photos folder into a page bundle, and favorites.md is taken
+    taken = {"index", "favorites"}
+    slugs = {}
+    for keyword in keywords:
+        base_slug = re.sub(r"[^a-z0-9]+", "-", keyword.lower()).strip("-") or "keyword"
+        slug = base_slug
+        suffix = 2
+        while slug in taken:
+            slug = f"{base_slug}-{suffix}"
+            suffix += 1
+        taken.add(slug)
+        slugs[keyword] = slug
+    return slugs
 
 
 class MiscellanySectionBuilder(WebSectionBuilder):
@@ -304,16 +550,20 @@ class MiscellanySectionBuilder(WebSectionBuilder):
         
         section_folder_path = self.section_parent_path.joinpath(
             self._document_section.title_text())
-        section_folder_path.mkdir()
+        section_folder_path.mkdir(exist_ok=self._scope is not None)
 
+        # like the photos section, the menu entry comes with the section (and points at the trip's subtree)
+        menu_name = self._document_section.title_text()
+        if self._trip is not None and self._trip.output_subtree != "":
+            menu_name = f"{self._trip.title} {menu_name}"
         section_index_frontmatter = {
             "draft" : False,
             "title" : self._document_section.title_text(),
             "healthData": self._health_data,
+            "menu": {"main": {"name": menu_name, "weight": 0}},
         }
 
-        with open(section_folder_path.joinpath("_index.md"), "w") as index_f:
-            index_f.write(dict_to_frontmatter_string(section_index_frontmatter))
+        self._write_content_file(section_folder_path.joinpath("_index.md"), section_index_frontmatter)
 
         for entry_number, entry in enumerate(self._document_section.entries()):
             frontmatter = {
@@ -322,9 +572,7 @@ class MiscellanySectionBuilder(WebSectionBuilder):
                 "layout" : "miscellany_single",
             }
 
-            with open(section_folder_path.joinpath(str(entry_number) + ".md"), "w") as f:
-                f.write(dict_to_frontmatter_string(frontmatter))
-                f.write(entry.get_markdown_content())
+            self._write_content_file(section_folder_path.joinpath(str(entry_number) + ".md"), frontmatter, entry.get_markdown_content())
 
     @property
     def section_parent_path(self):
@@ -332,9 +580,9 @@ class MiscellanySectionBuilder(WebSectionBuilder):
         Gets the folder withing the /content directory that this section folder should go inside
         i.e. content/post/
         """
-        parent_path = WebContentBuilder.CONTENT_FOLDER_PATH
+        parent_path = self.content_folder_path
         if not parent_path.exists():
-            parent_path.mkdir()
+            parent_path.mkdir(parents=True)
 
         return parent_path
 
@@ -345,33 +593,35 @@ class OverviewSectionBuilder(WebSectionBuilder):
 
         image_key_to_metadata = self._image_data.key_to_metadata
         for image_key in image_key_to_metadata:
-            images_data.append({"largestUri": image_key_to_metadata[image_key]["largest_uri"],
-                                        "thumbnailUri": image_key_to_metadata[image_key]["thumbnail_uri"],
-                                        "largewidth": int(image_key_to_metadata[image_key]["largewidth"]),
-                                        "largeheight": int(image_key_to_metadata[image_key]["largeheight"]),
-                                        "titlestr": image_key_to_metadata[image_key]["title"],
-                                        "captionstr": image_key_to_metadata[image_key]["caption"]})
+            images_data.append(image_frontmatter(image_key_to_metadata[image_key]))
+        home_url = self._trip.home_url if self._trip is not None else "/"
         overview_frontmatter = {
-                "title" : "Europe Trip 2022",
+                "title" : self._trip.title if self._trip is not None else "Europe Trip 2022",
                 "layout": "all_posts",
-                "url" : "/", # this makes it the home page
-                "aliases" : "/post", # redirect so this isn't just an empty page
-                "images": images_data
             }
-        with open(self.section_parent_path.joinpath("_index.md"), "w") as index_f:
-            index_f.write(dict_to_frontmatter_string(overview_frontmatter))
-            total_content_size = 0
-            for paragraph in self._document_section.get_description_elements():
-                new_content = paragraph_to_markdown(paragraph) + "\n\n"
-                index_f.write(new_content)
-                total_content_size += len(new_content)
-            assert total_content_size > 500, no_overview_debug_str(total_content_size, self._document_section.get_description_elements())
-            print("total size of content in overview section is: " + str(total_content_size))
+        if home_url == "/":
+            overview_frontmatter["url"] = home_url # this makes it the home page
+            overview_path = self.section_parent_path.joinpath("_index.md")
+        else:
+            # the trip's home page is its subtree's own section page; hugo takes a page's type from its top
+            # level folder, so the subtree is given the type (and layouts) of the post folder
+            overview_frontmatter["type"] = "post"
+            overview_frontmatter["cascade"] = {"type": "post"}
+            overview_frontmatter["menu"] = {"main": {"name": self._trip.title, "weight": -10}}
+            overview_path = self.content_folder_path.joinpath("_index.md")
+        overview_frontmatter["aliases"] = home_url + "post" # redirect so this isn't just an empty page
+        overview_frontmatter["images"] = images_data
+        overview_content = "".join(paragraph.to_markdown() + "\n\n" for paragraph in self._document_section.get_description_elements())
+        self._write_content_file(overview_path, overview_frontmatter, overview_content)
+        total_content_size = len(overview_content)
+        assert total_content_size > 500, no_overview_debug_str(total_content_size, self._document_section.get_description_elements())
+        print("total size of content in overview section is: " + str(total_content_size))
 
 
 def no_overview_debug_str(total_content_size, document_description_elements):
     import json
-    return f"not enough content; content size is {total_content_size}; document_dump is {json.dumps(document_description_elements, indent=4)}"
+    document_dump = [paragraph.to_markdown() for paragraph in document_description_elements]
+    return f"not enough content; content size is {total_content_size}; document_dump is {json.dumps(document_dump, indent=4)}"
 
 class WebContentBuilder:
 
@@ -380,12 +630,21 @@ class WebContentBuilder:
     def __init__(self, image_data: SmugMugImageData,
                        checkin_data: SwarmCheckinData,
                        health_data: Dict[str, Any],
-                       document_sections: List[DocumentSection]) -> None:
+                       document_sections: List[DocumentSection],
+                       size_budgets: Optional[Dict[str, Any]] = None,
+                       trip: Optional[TripConfig] = None,
+                       asset_manifest: Optional[AssetManifest] = None,
+                       scope: Optional[BuildScope] = None) -> None:
         self._image_data = image_data
         self._checkin_data = checkin_data
         self._health_data = health_data
         self._document_sections = document_sections.copy()
         self._special_sections: Dict[Any, Type[WebSectionBuilder]] = {}
+        self._trip = trip
+        self._asset_manifest = asset_manifest
+        self._scope = scope
+        self.size_report = ContentSizeReport(self.CONTENT_FOLDER_PATH, size_budgets,
+                                             trip.output_subtree if trip is not None else "")
         if not self.CONTENT_FOLDER_PATH.exists():
             self.CONTENT_FOLDER_PATH.mkdir()
 
@@ -406,17 +665,57 @@ class WebContentBuilder:
     def build_content(self) -> None:
         """
         Uses the current settings to build the documentation
+        With a scope, only the sections and entries in it are written; the rest of the content folder is left alone
         """
         # First, run the special builds
         for section_key in self._special_sections: 
-            section_builder = self._special_sections[section_key](self._image_data, self._checkin_data, self._health_data)
+            section_builder = self._special_sections[section_key](self._image_data, self._checkin_data, self._health_data, self.size_report, self._trip, self._asset_manifest, self._scope)
             if section_key in self._document_sections:
                 self._document_sections.remove(section_key)
+                if not self._in_scope(section_key):
+                    continue
                 section_builder.add_document_section(section_key)
+            elif self._scope is not None:
+                # special sections without a document section (search, photos) cover the whole site
+                continue
             section_builder.run_section_build()
 
         # All the remaining sections use the standard builder
         for document_section in self._document_sections:
-            section_builder = WebSectionBuilder(self._image_data, self._checkin_data, self._health_data)
+            if not self._in_scope(document_section):
+                continue
+            section_builder = WebSectionBuilder(self._image_data, self._checkin_data, self._health_data, self.size_report, self._trip, self._asset_manifest, self._scope)
             section_builder.add_document_section(document_section)
             section_builder.run_section_build()
+
+        # Then check nothing has grown past its size budget
+        self.size_report.print_report()
+        self.size_report.check_budgets()
+
+    def _in_scope(self, document_section: DocumentSection) -> bool:
+        return self._scope is None or self._scope.includes_section(document_section)
+
+    @staticmethod
+    def build_trips(content_builders: List[WebContentBuilder], max_workers: Optional[int] = None) -> None:
+        """
+        Builds several trips at once, each in its own process (the builds are cpu bound, mostly yaml dumping)
+        Each builder should be for a trip with its own output subtree
+        """
+        if len(content_builders) == 1:
+            content_builders[0].build_content()
+            return
+
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            builds = [pool.submit(_run_content_build, content_builder) for content_builder in content_builders]
+            for content_builder, build in zip(content_builders, builds):
+                # result() re-raises anything that went wrong in a trip's build
+                built_asset_manifest = build.result()
+                # the assets the trip generated (i.e. its maps) were recorded in the process' copy of the manifest
+                if content_builder._asset_manifest is not None:
+                    content_builder._asset_manifest.merge(built_asset_manifest)
+
+
+def _run_content_build(content_builder: WebContentBuilder) -> Optional[AssetManifest]:
+    # module level so the process pool can pickle it
+    content_builder.build_content()
+    return content_builder._asset_manifest
@@ -1,29 +1,39 @@
 import json
 from math import inf
 from operator import index
-from typing import Dict
+from typing import Callable, Dict, Optional
 import datetime
+from date_normalization import bucket_epoch_times
 
-def get_json_data():
-    with open("./site_building_data/swarm_checkins.json", "r") as f:
+SWARM_CHECKINS_PATH = "./site_building_data/swarm_checkins.json"
+
+def get_json_data(checkin_export_path: str = SWARM_CHECKINS_PATH):
+    with open(checkin_export_path, "r") as f:
         return json.load(f)
 
 def convert_epoch_time_to_datestring(epoch_time: int, offset: int) -> str:
-    # TODO this is ignoring the timezone, but for the date I don't think it really should matter? Not really sure what the tz offet is doing
-    # one thing that might correct it is using epoch_time - offset? but not really sure
-    return datetime.datetime.fromtimestamp(epoch_time).date().strftime("%Y-%m-%d")
+    # offset is the checkin's timeZoneOffset, in minutes from utc
+    return bucket_epoch_times([epoch_time], [offset])[0]
 
 
-def clean_swarm_data() -> Dict:
+def clean_swarm_data(checkin_export_path: str = SWARM_CHECKINS_PATH,
+                     include_date: Optional[Callable[[str], bool]] = None) -> Dict:
     from make_mapbox_images import correct_coordinate
     """
     Returns the cleaned swarm data with the uppder level key being the date string in the format "%Y-%m-%d"
+    include_date keeps only the checkins on matching days
     """
-    json_data = get_json_data()
+    json_data = get_json_data(checkin_export_path)
 
     new_data: Dict = {}
 
-    for single_checkin_data in json_data:
+    # bucket every checkin into its local day in one pass, using each checkin's own time zone
+    date_strings = bucket_epoch_times([single_checkin_data['createdAt'][0] for single_checkin_data in json_data],
+                                      [single_checkin_data['timeZoneOffset'][0] for single_checkin_data in json_data])
+
+    for single_checkin_data, date_string in zip(json_data, date_strings):
+        if include_date is not None and not include_date(date_string):
+            continue
         single_new_data = {
             "venue_name" : single_checkin_data["venue"]["name"][0],
             "images": list(map(lambda single_image_data: {"prefix" : single_image_data['prefix'][0], "suffix" : single_image_data['suffix'][0]}, single_checkin_data['photos']['items'])),
@@ -34,35 +44,28 @@ def clean_swarm_data() -> Dict:
             "epoch_time" : single_checkin_data['createdAt'][0]
         }
 
-        epoch_time: int = single_checkin_data['createdAt'][0]
-        timezone_offset: int = single_checkin_data['timeZoneOffset'][0]
-        date_string = convert_epoch_time_to_datestring(epoch_time, timezone_offset)
-
         if date_string in new_data:
             new_data[date_string]['all'].append(single_new_data)
         else:
             new_data[date_string] = {'all' : [single_new_data]}
 
-        for date, date_checkins in new_data.items():
-            max_latitude = -inf
-            max_longitude = -inf
-            min_latitude = inf
-            min_longitude = inf
-            locations = []
-            for checkin in date_checkins['all']:
-                latitude = checkin['latitude']
-                longitude = checkin['longitude']
-                max_latitude = max(latitude, max_latitude)
-                max_longitude = max(longitude, max_longitude)
-                min_latitude = min(latitude, min_latitude)
-                min_longitude = min(longitude, min_longitude)
-        
-            date_checkins['min_longitude'] = min_longitude
-            date_checkins['max_longitude'] = max_longitude
-            date_checkins['max_latitude'] = max_latitude
-            date_checkins['min_latitude'] = min_latitude
-            date_checkins['all'].sort(key=lambda x: x['epoch_time']) # should sort using the time
-
-
+    for date, date_checkins in new_data.items():
+        max_latitude = -inf
+        max_longitude = -inf
+        min_latitude = inf
+        min_longitude = inf
+        for checkin in date_checkins['all']:
+            latitude = checkin['latitude']
+            longitude = checkin['longitude']
+            max_latitude = max(latitude, max_latitude)
+            max_longitude = max(longitude, max_longitude)
+            min_latitude = min(latitude, min_latitude)
+            min_longitude = min(longitude, min_longitude)
     
+        date_checkins['min_longitude'] = min_longitude
+        date_checkins['max_longitude'] = max_longitude
+        date_checkins['max_latitude'] = max_latitude
+        date_checkins['min_latitude'] = min_latitude
+        date_checkins['all'].sort(key=lambda x: x['epoch_time']) # should sort using the time
+
     return new_data
@@ -0,0 +1,190 @@
+# This file describes the generated ./content tree as a manifest (the size and the sha256 of the
+# frontmatter and the body of every file) and diffs two trees or manifests quickly, so reworks of the
+# builders can be checked against the output of the old ones, and deploys can tell what changed
+#
+# python content_manifest.py write [content folder] [manifest path]
+# python content_manifest.py diff OLD NEW      (OLD and NEW are each a content folder or a manifest .json)
+import argparse
+import hashlib
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ruamel.yaml import YAML
+
+CONTENT_MANIFEST_PATH = Path("./content_manifest.json")
+FRONTMATTER_FENCE = "---\n"
+MAX_DIFFERENCES_SHOWN_PER_FILE = 20
+
+
+def split_frontmatter(text: str) -> Tuple[str, str]:
+    """
+    Returns the (frontmatter yaml, body) of a content file; the frontmatter is "" if there isn't any
+    """
+    if not text.startswith(FRONTMATTER_FENCE):
+        return "", text
+    closing_fence_index = text.find("\n" + FRONTMATTER_FENCE, len(FRONTMATTER_FENCE) - 1)
+    if closing_fence_index == -1:
+        return "", text
+    return (text[len(FRONTMATTER_FENCE):closing_fence_index + 1],
+            text[closing_fence_index + 1 + len(FRONTMATTER_FENCE):])
+
+
+def manifest_entry(path: Path) -> Dict[str, Any]:
+    content = path.read_bytes()
+    frontmatter, body = split_frontmatter(content.decode("utf-8"))
+    return {
+        "size": len(content),
+        "frontmatter_sha256": hashlib.sha256(frontmatter.encode("utf-8")).hexdigest(),
+        "body_sha256": hashlib.sha256(body.encode("utf-8")).hexdigest(),
+    }
+
+
+def build_manifest(content_folder_path: Path, max_workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns path (relative to the content folder) => manifest entry, for every file in the folder
+    """
+    paths = sorted(path for path in content_folder_path.rglob("*") if path.is_file())
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        entries = list(pool.map(manifest_entry, paths))
+    return {path.relative_to(content_folder_path).as_posix(): entry for path, entry in zip(paths, entries)}
+
+
+def write_manifest(content_folder_path: Path, manifest_path: Path = CONTENT_MANIFEST_PATH) -> Dict[str, Dict[str, Any]]:
+    manifest = build_manifest(content_folder_path)
+    with open(manifest_path, "w") as manifest_f:
+        json.dump(manifest, manifest_f, indent=1, sort_keys=True)
+    return manifest
+
+
+def load_manifest(tree_or_manifest_path: Path) -> Dict[str, Dict[str, Any]]:
+    if tree_or_manifest_path.is_dir():
+        return build_manifest(tree_or_manifest_path)
+    with open(tree_or_manifest_path, "r") as manifest_f:
+        return json.load(manifest_f)
+
+
+def changed_paths(old_manifest: Dict[str, Dict[str, Any]], new_manifest: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Returns the "added", "removed", "frontmatter_changed" and "body_changed" paths
+    (a file can be in both of the last two)
+    """
+    changes: Dict[str, List[str]] = {"added": [], "removed": [], "frontmatter_changed": [], "body_changed": []}
+    for path in sorted(set(old_manifest) | set(new_manifest)):
+        if path not in old_manifest:
+            changes["added"].append(path)
+        elif path not in new_manifest:
+            changes["removed"].append(path)
+        else:
+            if old_manifest[path]["frontmatter_sha256"] != new_manifest[path]["frontmatter_sha256"]:
+                changes["frontmatter_changed"].append(path)
+            if old_manifest[path]["body_sha256"] != new_manifest[path]["body_sha256"]:
+                changes["body_changed"].append(path)
+    return changes
+
+
+def _parse_frontmatter(path: Path) -> Any:
+    frontmatter, _ = split_frontmatter(path.read_text(encoding="utf-8"))
+    return YAML(typ="safe").load(frontmatter)
+
+
+def semantic_differences(old_value: Any, new_value: Any, key_path: str = "") -> List[str]:
+    """
+    Returns a line for every place the two parsed yaml values differ
+    """
+    if isinstance(old_value, dict) and isinstance(new_value, dict):
+        differences = []
+        for key in list(old_value) + [key for key in new_value if key not in old_value]:
+            child_path = f"{key_path}.{key}" if key_path else str(key)
+            if key not in new_value:
+                differences.append(f"{child_path}: removed")
+            elif key not in old_value:
+                differences.append(f"{child_path}: added {new_value[key]!r}")
+            else:
+                differences += semantic_differences(old_value[key], new_value[key], child_path)
+        return differences
+    if isinstance(old_value, list) and isinstance(new_value, list):
+        differences = []
+        for index in range(max(len(old_value), len(new_value))):
+            child_path = f"{key_path}[{index}]"
+            if index >= len(new_value):
+                differences.append(f"{child_path}: removed")
+            elif index >= len(old_value):
+                differences.append(f"{child_path}: added {new_value[index]!r}")
+            else:
+                differences += semantic_differences(old_value[index], new_value[index], child_path)
+        return differences
+    if old_value != new_value:
+        return [f"{key_path or '(frontmatter)'}: {old_value!r} -> {new_value!r}"]
+    return []
+
+
+def _frontmatter_differences(old_and_new_paths: Tuple[Path, Path]) -> List[str]:
+    # module level so the process pool can pickle it
+    old_path, new_path = old_and_new_paths
+    return semantic_differences(_parse_frontmatter(old_path), _parse_frontmatter(new_path))
+
+
+def diff(old_path: Path, new_path: Path) -> bool:
+    """
+    Prints the differences between two content trees (or manifests); returns True if they are the same
+    Frontmatter of changed files is compared as parsed yaml when both sides are trees
+    """
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        old_manifest, new_manifest = pool.map(load_manifest, [old_path, new_path])
+    changes = changed_paths(old_manifest, new_manifest)
+
+    same = True
+    for path in changes["added"]:
+        print(f"added: {path}")
+        same = False
+    for path in changes["removed"]:
+        print(f"removed: {path}")
+        same = False
+    for path in changes["body_changed"]:
+        print(f"body changed: {path}")
+        same = False
+
+    frontmatter_changed = changes["frontmatter_changed"]
+    if frontmatter_changed and old_path.is_dir() and new_path.is_dir():
+        # yaml parsing is the slow part, so it is spread over processes
+        with ProcessPoolExecutor() as pool:
+            all_differences = pool.map(_frontmatter_differences,
+                                       [(old_path.joinpath(path), new_path.joinpath(path)) for path in frontmatter_changed],
+                                       chunksize=8)
+            for path, differences in zip(frontmatter_changed, all_differences):
+                if not differences:
+                    print(f"frontmatter reformatted (same once parsed): {path}")
+                    continue
+                same = False
+                print(f"frontmatter changed: {path}")
+                for difference in differences[:MAX_DIFFERENCES_SHOWN_PER_FILE]:
+                    print(f"    {difference}")
+                if len(differences) > MAX_DIFFERENCES_SHOWN_PER_FILE:
+                    print(f"    ... and {len(differences) - MAX_DIFFERENCES_SHOWN_PER_FILE} more")
+    else:
+        for path in frontmatter_changed:
+            print(f"frontmatter changed: {path}")
+            same = False
+
+    print(f"{len(old_manifest)} files before, {len(new_manifest)} after: " + ("same" if same else "DIFFERENT"))
+    return same
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="manifest and diff of the generated content tree")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    write_parser = subparsers.add_parser("write", help="write the manifest of a content folder")
+    write_parser.add_argument("content_folder", nargs="?", default="./content")
+    write_parser.add_argument("manifest", nargs="?", default=str(CONTENT_MANIFEST_PATH))
+    diff_parser = subparsers.add_parser("diff", help="diff two content folders and/or manifests; exits 1 if they differ")
+    diff_parser.add_argument("old")
+    diff_parser.add_argument("new")
+    args = parser.parse_args()
+
+    if args.command == "write":
+        write_manifest(Path(args.content_folder), Path(args.manifest))
+    else:
+        sys.exit(0 if diff(Path(args.old), Path(args.new)) else 1)
@@ -0,0 +1,92 @@
+# This file buckets timestamps from all the data sources (smugmug images, swarm checkins, the trip
+# log) into trip local calendar days, so that every source agrees on which day something happened
+#
+# Everything is done on integer "local seconds" (seconds since the epoch, shifted into the local
+# time of the record), so a whole album or checkin history is bucketed in one pass with no
+# datetime objects made per record; the day strings themselves are memoized
+import datetime
+import json
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, TypeVar
+
+DATE_STRING_FORMAT = "%Y-%m-%d"
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=None)
+def parse_date(date_string: str, date_format: str = DATE_STRING_FORMAT) -> datetime.date:
+    """
+    Memoized strptime for dates; raises ValueError if date_string doesn't match date_format
+    """
+    return datetime.datetime.strptime(date_string, date_format).date()
+
+
+@lru_cache(maxsize=None)
+def _day_string(day_number: int) -> str:
+    return datetime.date.fromordinal(day_number + _EPOCH_ORDINAL).strftime(DATE_STRING_FORMAT)
+
+
+@lru_cache(maxsize=None)
+def _iso_date_to_day_number(iso_date: str) -> int:
+    return datetime.date.fromisoformat(iso_date).toordinal() - _EPOCH_ORDINAL
+
+
+def bucket_local_seconds(local_seconds: Iterable[int]) -> List[str]:
+    """
+    Returns the "%Y-%m-%d" day of each local time (seconds since the epoch in the record's own time zone)
+    """
+    return [_day_string(seconds // SECONDS_PER_DAY) for seconds in local_seconds]
+
+
+def bucket_epoch_times(epoch_times: Sequence[int], utc_offsets_minutes: Sequence[int]) -> List[str]:
+    """
+    Buckets utc epoch times into local days, using the utc offset (in minutes) recorded with each time
+    """
+    if len(epoch_times) != len(utc_offsets_minutes):
+        raise ValueError("every epoch time needs a utc offset")
+    return bucket_local_seconds(epoch_time + offset * 60 for epoch_time, offset in zip(epoch_times, utc_offsets_minutes))
+
+
+def _wall_clock_seconds(iso_datetime: str) -> int:
+    # 2022-07-11T13:50:19+00:00; only the wall clock matters so the utc offset suffix is ignored
+    return (_iso_date_to_day_number(iso_datetime[:10]) * SECONDS_PER_DAY
+            + int(iso_datetime[11:13]) * 3600 + int(iso_datetime[14:16]) * 60 + int(iso_datetime[17:19]))
+
+
+def load_image_date_overrides(overrides_path: str) -> Dict[str, str]:
+    """
+    Returns the image key => "%Y-%m-%d" overrides for images whose dates are wrong in smugmug
+    """
+    with open(overrides_path) as f:
+        return json.load(f)
+
+
+def bucket_image_times(image_keys: Sequence[str], iso_datetimes: Sequence[str],
+                       clock_shift_seconds: int = 0,
+                       overrides: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    Buckets smugmug DateTimeOriginal values into local days, applying the camera clock shift (the
+    trip's, see trips.json) and any per image overrides (which win over the image's own time)
+    """
+    if len(image_keys) != len(iso_datetimes):
+        raise ValueError("every image key needs a date")
+    if overrides is None:
+        overrides = {}
+    days = bucket_local_seconds(_wall_clock_seconds(iso_datetime) + clock_shift_seconds
+                                for iso_datetime in iso_datetimes)
+    return [overrides.get(image_key, day) for image_key, day in zip(image_keys, days)]
+
+
+def group_by_day(values: Iterable[T], days: Iterable[str]) -> Dict[str, List[T]]:
+    """
+    Groups values by their day, keeping the order they were given in
+    """
+    grouped: Dict[str, List[T]] = {}
+    for value, day in zip(values, days):
+        grouped.setdefault(day, []).append(value)
+    return grouped
@@ -0,0 +1,196 @@
+# This file is the one http layer every fetcher goes through (smugmug, thumbnails, mapbox)
+# It keeps connections alive between requests, bounds how many requests are in flight to each host,
+# retries transient failures (429s, 5xxs, dropped connections) with exponential backoff that honours
+# Retry-After, and records how long every request took
+import email.utils
+import random
+import statistics
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 0.5
+# the longest exponential backoff between attempts
+MAX_BACKOFF_SECONDS = 60
+# a server asking (with Retry-After) for a longer wait than this gets its error response returned instead;
+# clients and single requests can allow longer waits
+MAX_RETRY_AFTER_SECONDS = 300
+MAX_CONCURRENT_PER_HOST = 8
+DEFAULT_TIMEOUT_SECONDS = 30
+
+
+class RequestMetric:
+    """
+    How one request went (including all of its retries)
+    """
+    __slots__ = ("host", "status_code", "seconds", "attempts")
+
+    def __init__(self, host: str, status_code: Optional[int], seconds: float, attempts: int) -> None:
+        self.host = host
+        self.status_code = status_code # None if the request never got a response
+        self.seconds = seconds
+        self.attempts = attempts
+
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """
+    Returns how long the Retry-After header asks us to wait, or None if there isn't a usable one
+    """
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class HttpClient:
+    """
+    Pooled, retrying http client; safe to share between threads
+    """
+
+    def __init__(self, max_concurrent_per_host: int = MAX_CONCURRENT_PER_HOST,
+                       max_attempts: int = MAX_ATTEMPTS,
+                       backoff_base_seconds: float = BACKOFF_BASE_SECONDS,
+                       max_retry_after_seconds: float = MAX_RETRY_AFTER_SECONDS) -> None:
+        self._session = requests.Session()
+        # one pooled connection per allowed in flight request, so nothing is ever opened and thrown away
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max_concurrent_per_host)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._max_concurrent_per_host = max_concurrent_per_host
+        self._max_attempts = max_attempts
+        self._backoff_base_seconds = backoff_base_seconds
+        self._max_retry_after_seconds = max_retry_after_seconds
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._metrics: List[RequestMetric] = []
+
+    def _host_semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(self._max_concurrent_per_host)
+            return self._host_semaphores[host]
+
+    def _backoff_seconds(self, attempt: int, response: Optional[requests.Response],
+                         max_retry_after_seconds: float) -> Optional[float]:
+        """
+        How long to wait before the next attempt; None if the server asked for longer than we are willing to wait
+        """
+        if response is not None:
+            requested_wait = retry_after_seconds(response)
+            if requested_wait is not None:
+                # retrying before the server is ready would only use up the attempts
+                return requested_wait if requested_wait <= max_retry_after_seconds else None
+        # full jitter, so threads that failed together don't all retry together
+        return random.uniform(0, min(MAX_BACKOFF_SECONDS, self._backoff_base_seconds * 2 ** attempt))
+
+    def request(self, method: str, url: str, max_retry_after_seconds: Optional[float] = None, **kwargs) -> requests.Response:
+        """
+        Same arguments as requests.request; retries transient failures and returns the last response
+        (which may still be an error response, once the attempts run out)
+        max_retry_after_seconds overrides the client's longest Retry-After wait for this request
+        """
+        if max_retry_after_seconds is None:
+            max_retry_after_seconds = self._max_retry_after_seconds
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT_SECONDS)
+        host = urlsplit(url).netloc
+        start_time = time.monotonic()
+        response = None
+        attempt = 0
+        try:
+            for attempt in range(1, self._max_attempts + 1):
+                response = None
+                try:
+                    with self._host_semaphore(host):
+                        response = self._session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self._max_attempts:
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUS_CODES or attempt == self._max_attempts:
+                        return response
+                backoff_seconds = self._backoff_seconds(attempt, response, max_retry_after_seconds)
+                if backoff_seconds is None:
+                    return response
+                if response is not None:
+                    # the connection goes back to the pool before we wait
+                    response.close()
+                time.sleep(backoff_seconds)
+            raise AssertionError("unreachable: the last attempt either returns or raises")
+        finally:
+            metric = RequestMetric(host, response.status_code if response is not None else None,
+                                   time.monotonic() - start_time, attempt)
+            with self._lock:
+                self._metrics.append(metric)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def download(self, url: str, output_path: Union[str, Path], **kwargs) -> None:
+        """
+        Saves the body of url to output_path, raising for error responses
+        """
+        response = self.get(url, **kwargs)
+        response.raise_for_status()
+        Path(output_path).write_bytes(response.content)
+
+    @property
+    def metrics(self) -> List[RequestMetric]:
+        with self._lock:
+            return self._metrics.copy()
+
+    def format_metrics(self) -> str:
+        """
+        Per host request count, retries, failures and latency percentiles
+        """
+        by_host: Dict[str, List[RequestMetric]] = {}
+        for metric in self.metrics:
+            by_host.setdefault(metric.host, []).append(metric)
+
+        lines = [f"{'host':<32}{'requests':>10}{'retries':>10}{'failed':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for host, host_metrics in sorted(by_host.items()):
+            latencies = sorted(metric.seconds * 1000 for metric in host_metrics)
+            p95 = statistics.quantiles(latencies, n=20, method="inclusive")[-1] if len(latencies) > 1 else latencies[0]
+            retries = sum(metric.attempts - 1 for metric in host_metrics)
+            failed = sum(1 for metric in host_metrics if metric.status_code is None or metric.status_code >= 400)
+            lines.append(f"{host:<32}{len(host_metrics):>10}{retries:>10}{failed:>8}"
+                         f"{statistics.median(latencies):>10.0f}{p95:>10.0f}{latencies[-1]:>10.0f}")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+_default_client: Optional[HttpClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> HttpClient:
+    """
+    The client fetchers use when they aren't handed one, shared by everything in the process
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
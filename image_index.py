@@ -0,0 +1,140 @@
+# This file holds the inverted index of the smugmug album: keyword => images and favorites => images,
+# each also broken down by date, all built in the same single pass over the album as json_reformatting
+# so builders can make tag pages and favorites galleries without rescanning the album
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+# images tagged with any of these keywords are favorites (smugmug has no favorite flag of its own)
+FAVORITE_KEYWORDS = frozenset(["fav", "favs", "favorite", "favorites", "favourite", "favourites"])
+
+IMAGE_INDEX_FOLDER_PATH = Path("./data/image_index")
+
+
+def normalize_keywords(image_data: Dict) -> List[str]:
+    """
+    Returns the lowercased keywords of an AlbumImage (from KeywordArray, or the "; " separated Keywords)
+    """
+    keywords = image_data.get("KeywordArray")
+    if keywords is None:
+        keywords = (image_data.get("Keywords") or "").split(";")
+    normalized = []
+    for keyword in keywords:
+        keyword = keyword.strip().lower()
+        if keyword and keyword not in normalized:
+            normalized.append(keyword)
+    return normalized
+
+
+class ImageIndex:
+    """
+    keyword => date => image keys, and favorites date => image keys, in album order
+    Once the trip's sections are known (add_sections), each section's keywords and favorites too
+    """
+
+    def __init__(self) -> None:
+        self._keyword_date_keys: Dict[str, Dict[str, List[str]]] = {}
+        self._favorite_date_keys: Dict[str, List[str]] = {}
+        self._date_keywords: Dict[str, List[str]] = {}
+        self._section_keywords: Dict[str, List[str]] = {}
+        self._section_favorites: Dict[str, List[str]] = {}
+
+    def add(self, image_key: str, date: str, keywords: Iterable[str]) -> None:
+        """
+        Adds one image; favorite keywords mark the image as a favorite rather than becoming keywords
+        """
+        for keyword in keywords:
+            if keyword in FAVORITE_KEYWORDS:
+                favorites_on_date = self._favorite_date_keys.setdefault(date, [])
+                if not favorites_on_date or favorites_on_date[-1] != image_key:
+                    favorites_on_date.append(image_key)
+                continue
+            self._keyword_date_keys.setdefault(keyword, {}).setdefault(date, []).append(image_key)
+            keywords_on_date = self._date_keywords.setdefault(date, [])
+            if keyword not in keywords_on_date:
+                keywords_on_date.append(keyword)
+
+    @property
+    def keywords(self) -> List[str]:
+        return sorted(self._keyword_date_keys)
+
+    def keywords_on(self, date: str) -> List[str]:
+        return sorted(self._date_keywords.get(date, []))
+
+    def add_sections(self, section_dates: Dict[str, List[str]]) -> None:
+        """
+        Precomputes the keywords and favorites of each section (title => the section's days)
+        """
+        for title, dates in section_dates.items():
+            self._section_keywords[title] = sorted({keyword for date in dates for keyword in self._date_keywords.get(date, [])})
+            self._section_favorites[title] = self.favorites(dates)
+
+    def section_keywords(self, title: str) -> List[str]:
+        return self._section_keywords.get(title, [])
+
+    def section_favorites(self, title: str) -> List[str]:
+        return self._section_favorites.get(title, [])
+
+    def keys_for_keyword(self, keyword: str, dates: Iterable[str] = None) -> List[str]:
+        """
+        Images with the keyword; only those on the given dates (i.e. a section's days) if dates is given
+        """
+        date_keys = self._keyword_date_keys.get(keyword, {})
+        if dates is None:
+            dates = sorted(date_keys)
+        return [image_key for date in dates for image_key in date_keys.get(date, [])]
+
+    def favorites(self, dates: Iterable[str] = None) -> List[str]:
+        """
+        Favorite images; only those on the given dates if dates is given
+        """
+        if dates is None:
+            dates = sorted(self._favorite_date_keys)
+        return [image_key for date in dates for image_key in self._favorite_date_keys.get(date, [])]
+
+    def favorites_by_date(self) -> Dict[str, List[str]]:
+        return {date: date_keys.copy() for date, date_keys in self._favorite_date_keys.items()}
+
+    def only_dates(self, dates: Iterable[str]) -> ImageIndex:
+        """
+        Returns a copy of the index holding only the given dates (i.e. a trip's date window);
+        sections have to be added to the copy
+        """
+        dates = set(dates)
+        restricted = ImageIndex()
+        for keyword, date_keys in self._keyword_date_keys.items():
+            kept = {date: keys.copy() for date, keys in date_keys.items() if date in dates}
+            if kept:
+                restricted._keyword_date_keys[keyword] = kept
+        restricted._favorite_date_keys = {date: keys.copy() for date, keys in self._favorite_date_keys.items() if date in dates}
+        restricted._date_keywords = {date: keywords.copy() for date, keywords in self._date_keywords.items() if date in dates}
+        return restricted
+
+    def to_compact_dict(self) -> Dict:
+        """
+        Each image key is stored once, everything else refers to images by their position in "images"
+        """
+        image_keys: List[str] = []
+        positions: Dict[str, int] = {}
+
+        def position(image_key: str) -> int:
+            if image_key not in positions:
+                positions[image_key] = len(image_keys)
+                image_keys.append(image_key)
+            return positions[image_key]
+
+        keywords = {keyword: {date: [position(image_key) for image_key in date_keys]
+                              for date, date_keys in sorted(self._keyword_date_keys[keyword].items())}
+                    for keyword in self.keywords}
+        favorites = {date: [position(image_key) for image_key in date_keys]
+                     for date, date_keys in sorted(self._favorite_date_keys.items())}
+        sections = {title: {"keywords": self._section_keywords[title],
+                            "favorites": [position(image_key) for image_key in self._section_favorites[title]]}
+                    for title in self._section_keywords}
+        return {"images": image_keys, "keywords": keywords, "favorites": favorites, "sections": sections}
+
+    def write(self, index_path: Path) -> None:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(index_path, "w") as index_f:
+            json.dump(self.to_compact_dict(), index_f, separators=(",", ":"))
@@ -0,0 +1,150 @@
+# This file adds placeholder and dimension data to the smugmug image metadata
+# Each thumbnail is downloaded once into a local content addressed cache, and from it a tiny
+# inline jpeg placeholder and a dominant colour are computed so pages don't render blank boxes
+# (or shift around) while the real thumbnails load
+import base64
+import hashlib
+import io
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import requests
+from PIL import Image
+
+from http_client import HttpClient, get_default_client
+
+IMAGE_CACHE_PATH = Path("./.image_cache")
+PLACEHOLDER_SIZE = 16 # longest side of the placeholder in pixels
+PLACEHOLDER_QUALITY = 40
+MAX_WORKERS = 16
+
+
+class ImageCache:
+    """
+    Content addressed cache of downloaded images
+
+    objects/<sha256 of the image bytes> holds the image itself
+    urls/<sha256 of the url>.json holds the record computed for the image at that url
+    """
+
+    def __init__(self, cache_path: Path = IMAGE_CACHE_PATH) -> None:
+        self._objects_path = cache_path.joinpath("objects")
+        self._urls_path = cache_path.joinpath("urls")
+        self._objects_path.mkdir(parents=True, exist_ok=True)
+        self._urls_path.mkdir(parents=True, exist_ok=True)
+
+    def _url_record_path(self, url: str) -> Path:
+        return self._urls_path.joinpath(hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def get_record(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached record for the url, or None if the url hasn't been processed yet
+        """
+        record_path = self._url_record_path(url)
+        if not record_path.exists():
+            return None
+        with open(record_path, "r") as record_f:
+            record = json.load(record_f)
+        if not self._objects_path.joinpath(record["content_hash"]).exists():
+            return None
+        return record
+
+    def _write_atomically(self, path: Path, content: bytes) -> None:
+        # write then rename so a crashed build never leaves half a file in the cache; the temp file's name
+        # is unique, since threads can be writing the same object (identical thumbnails) at once
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as tmp_f:
+            tmp_f.write(content)
+        Path(tmp_f.name).replace(path)
+
+    def put_object(self, content: bytes) -> str:
+        """
+        Stores the image bytes and returns their content hash
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        object_path = self._objects_path.joinpath(content_hash)
+        if not object_path.exists():
+            self._write_atomically(object_path, content)
+        return content_hash
+
+    def put_record(self, url: str, record: Dict[str, Any]) -> None:
+        self._write_atomically(self._url_record_path(url), json.dumps(record).encode())
+
+
+def compute_placeholder(content: bytes) -> Dict[str, Any]:
+    """
+    Returns the placeholder data uri, dominant colour and dimensions of the given image bytes
+    """
+    with Image.open(io.BytesIO(content)) as image:
+        image = image.convert("RGB")
+        width, height = image.size
+
+        tiny = image.copy()
+        tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        placeholder_f = io.BytesIO()
+        tiny.save(placeholder_f, format="JPEG", quality=PLACEHOLDER_QUALITY, optimize=True)
+        placeholder = "data:image/jpeg;base64," + base64.b64encode(placeholder_f.getvalue()).decode("ascii")
+
+        # the most common colour once the image is reduced to a small palette
+        palette_image = tiny.quantize(colors=4)
+        palette = palette_image.getpalette()
+        _, dominant_index = max(palette_image.getcolors())
+        red, green, blue = palette[dominant_index * 3:dominant_index * 3 + 3]
+
+    return {
+        "placeholder": placeholder,
+        "dominant_color": f"#{red:02x}{green:02x}{blue:02x}",
+        "width": width,
+        "height": height,
+    }
+
+
+def process_image(url: str, cache: ImageCache, client: HttpClient) -> Dict[str, Any]:
+    """
+    Returns the placeholder record for the image at url, fetching it only if it isn't cached yet
+    """
+    record = cache.get_record(url)
+    if record is not None:
+        return record
+
+    resp = client.get(url)
+    resp.raise_for_status()
+    record = compute_placeholder(resp.content)
+    record["content_hash"] = cache.put_object(resp.content)
+    cache.put_record(url, record)
+    return record
+
+
+def _process_image_or_none(image_key: str, url: str, cache: ImageCache, client: HttpClient) -> Optional[Dict[str, Any]]:
+    # one missing or broken thumbnail shouldn't fail the whole build; the image just goes without a placeholder
+    try:
+        return process_image(url, cache, client)
+    except (requests.RequestException, OSError) as error:
+        print(f"no placeholder for image {image_key} ({url}): {error}")
+        return None
+
+
+def add_image_placeholders(key_to_metadata: Dict[str, Dict[str, Any]],
+                           cache_path: Path = IMAGE_CACHE_PATH,
+                           max_workers: int = MAX_WORKERS,
+                           client: Optional[HttpClient] = None) -> None:
+    """
+    Adds "placeholder", "dominant_color", "thumbnail_width" and "thumbnail_height" to each image's
+    metadata (the output of json_reformatting), using each image's thumbnail
+    Images whose thumbnail can't be fetched or read are left without them
+    """
+    cache = ImageCache(cache_path)
+    image_keys = list(key_to_metadata)
+    client = client or get_default_client()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        records = pool.map(lambda image_key: _process_image_or_none(image_key, key_to_metadata[image_key]["thumbnail_uri"], cache, client),
+                           image_keys)
+        for image_key, record in zip(image_keys, records):
+            if record is None:
+                continue
+            key_to_metadata[image_key]["placeholder"] = record["placeholder"]
+            key_to_metadata[image_key]["dominant_color"] = record["dominant_color"]
+            key_to_metadata[image_key]["thumbnail_width"] = str(record["width"])
+            key_to_metadata[image_key]["thumbnail_height"] = str(record["height"])
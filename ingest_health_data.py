@@ -0,0 +1,267 @@
+# This file builds europe_health.json (or any trip's health file) from the raw exports, instead of
+# assembling it by hand
+#
+# Apple Health export.xml files are easily several gigabytes, so they are stream parsed (iterparse,
+# clearing every element once it has been read) and everything is added up per person per trip day
+# in a single pass; Fitbit exports (the per month json files, or the csv account export) are read a
+# file / a row at a time. Memory use is bounded by the number of trip days, not the size of the export
+#
+# python ingest_health_data.py --trip europe-2022 --apple bb=~/export.xml --fitbit tw=~/fitbit/
+#
+# Keys written for each day are <metric>_<source>_<person>, i.e. steps_apple_bb or sleep_minutes_fitbit_tw,
+# and are merged into what is already in the trip's health file
+import argparse
+import csv
+import json
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from date_normalization import DATE_STRING_FORMAT, parse_date
+from trips import TripConfig, load_trip_configs
+
+KILOMETERS_PER_MILE = 1.609344
+KILOJOULES_PER_KILOCALORIE = 4.184
+CENTIMETERS_PER_MILE = 160934.4
+
+APPLE_STEPS = "HKQuantityTypeIdentifierStepCount"
+APPLE_DISTANCE = "HKQuantityTypeIdentifierDistanceWalkingRunning"
+APPLE_ACTIVE_CALORIES = "HKQuantityTypeIdentifierActiveEnergyBurned"
+APPLE_SLEEP = "HKCategoryTypeIdentifierSleepAnalysis"
+# everything but "in bed" and "awake" counts as asleep (the asleep values were split up in newer exports)
+APPLE_NOT_ASLEEP_VALUES = frozenset(["HKCategoryValueSleepAnalysisInBed", "HKCategoryValueSleepAnalysisAwake"])
+
+# how each metric is rounded in the health file
+METRIC_DECIMALS = {"steps": 0, "miles": 4, "active_calories": 0, "sleep_minutes": 0}
+
+FITBIT_CSV_DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%m/%d/%Y", "%d/%m/%Y")
+
+
+class DailyHealthTotals:
+    """
+    Running per day totals; only days inside the trip's date window are kept
+    """
+
+    def __init__(self, trip: TripConfig) -> None:
+        self._trip = trip
+        self._totals: Dict[str, Dict[str, float]] = {}
+        # key => its metric (keys aren't parsed back apart, since people's names can have "_" in them)
+        self._key_metrics: Dict[str, str] = {}
+
+    def add(self, date_string: str, metric: str, key_suffix: str, value: float) -> None:
+        """
+        Adds to the day's total for metric + key_suffix, i.e. "steps" + "_apple_bb"
+        """
+        if not self._trip.in_date_window(date_string):
+            return
+        key = metric + key_suffix
+        self._key_metrics[key] = metric
+        day_totals = self._totals.setdefault(date_string, {})
+        day_totals[key] = day_totals.get(key, 0) + value
+
+    def rounded(self) -> Dict[str, Dict[str, float]]:
+        output: Dict[str, Dict[str, float]] = {}
+        for date_string, day_totals in self._totals.items():
+            output[date_string] = {}
+            for key, value in day_totals.items():
+                decimals = METRIC_DECIMALS[self._key_metrics[key]]
+                output[date_string][key] = int(round(value)) if decimals == 0 else round(value, decimals)
+        return output
+
+
+def _apple_minutes_between(start_date: str, end_date: str) -> float:
+    # "2022-06-26 23:01:02 +0200"
+    date_format = "%Y-%m-%d %H:%M:%S %z"
+    return (datetime.strptime(end_date, date_format) - datetime.strptime(start_date, date_format)).total_seconds() / 60
+
+
+def _apple_record_values(attributes: Dict[str, str]) -> Iterable[Tuple[str, str, float]]:
+    """
+    Yields the (day, metric, value) a health record contributes; days are the local day of the record
+    """
+    record_type = attributes.get("type")
+    if record_type == APPLE_STEPS:
+        yield attributes["startDate"][:10], "steps", float(attributes["value"])
+    elif record_type == APPLE_DISTANCE:
+        miles = float(attributes["value"])
+        if attributes.get("unit") == "km":
+            miles /= KILOMETERS_PER_MILE
+        elif attributes.get("unit") == "m":
+            miles /= KILOMETERS_PER_MILE * 1000
+        yield attributes["startDate"][:10], "miles", miles
+    elif record_type == APPLE_ACTIVE_CALORIES:
+        kilocalories = float(attributes["value"])
+        if attributes.get("unit") == "kJ":
+            kilocalories /= KILOJOULES_PER_KILOCALORIE
+        yield attributes["startDate"][:10], "active_calories", kilocalories
+    elif record_type == APPLE_SLEEP and attributes.get("value") not in APPLE_NOT_ASLEEP_VALUES:
+        # sleep counts towards the day it ended on ("started the day having slept for")
+        yield attributes["endDate"][:10], "sleep_minutes", _apple_minutes_between(attributes["startDate"], attributes["endDate"])
+
+
+def ingest_apple_health_export(export_path: Path, person: str, totals: DailyHealthTotals,
+                               source_name_filter: Optional[str] = None) -> int:
+    """
+    Adds up an Apple Health export.xml into totals in one streaming pass; returns the number of records read
+    source_name_filter (i.e. "Watch") keeps only records from matching sources, since the phone and
+    the watch both record steps
+    """
+    key_suffix = f"_apple_{person}"
+    record_count = 0
+    depth = 0
+    root = None
+    for event, element in ElementTree.iterparse(str(export_path), events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            depth += 1
+            continue
+
+        depth -= 1
+        # only top level elements are looked at, their children are cleared along with them
+        if depth != 1:
+            continue
+        if element.tag == "Record":
+            record_count += 1
+            attributes = element.attrib
+            if source_name_filter is None or source_name_filter in attributes.get("sourceName", ""):
+                for date_string, metric, value in _apple_record_values(attributes):
+                    totals.add(date_string, metric, key_suffix, value)
+        # drop the element (and the root's reference to it) so memory stays flat
+        element.clear()
+        root.clear()
+    return record_count
+
+
+def _fitbit_json_day(date_time: str) -> str:
+    # "06/26/22 07:00:00", in the tracker's local time
+    return parse_date(date_time[:8], "%m/%d/%y").strftime(DATE_STRING_FORMAT)
+
+
+def _parse_fitbit_csv_date(date_text: str) -> str:
+    for date_format in FITBIT_CSV_DATE_FORMATS:
+        try:
+            return parse_date(date_text, date_format).strftime(DATE_STRING_FORMAT)
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised fitbit date {date_text!r}")
+
+
+def _fitbit_number(text: str) -> float:
+    return float(text.replace(",", "")) if text.strip() else 0.0
+
+
+def ingest_fitbit_json_export(export_path: Path, person: str, totals: DailyHealthTotals) -> int:
+    """
+    Adds up the steps-*.json, distance-*.json and sleep-*.json files of a fitbit data export
+    (each file holds a month, so one is loaded at a time); returns the number of entries read
+    """
+    entry_count = 0
+    key_suffix = f"_fitbit_{person}"
+    for steps_path in sorted(export_path.rglob("steps-*.json")):
+        with open(steps_path) as steps_f:
+            for entry in json.load(steps_f):
+                totals.add(_fitbit_json_day(entry["dateTime"]), "steps", key_suffix, float(entry["value"]))
+                entry_count += 1
+    for distance_path in sorted(export_path.rglob("distance-*.json")):
+        with open(distance_path) as distance_f:
+            for entry in json.load(distance_f):
+                totals.add(_fitbit_json_day(entry["dateTime"]), "miles", key_suffix, float(entry["value"]) / CENTIMETERS_PER_MILE)
+                entry_count += 1
+    for sleep_path in sorted(export_path.rglob("sleep-*.json")):
+        with open(sleep_path) as sleep_f:
+            for entry in json.load(sleep_f):
+                # naps don't count towards the night's sleep
+                if entry.get("mainSleep", True):
+                    totals.add(entry["dateOfSleep"], "sleep_minutes", key_suffix, float(entry["minutesAsleep"]))
+                entry_count += 1
+    return entry_count
+
+
+def ingest_fitbit_csv_export(export_path: Path, person: str, totals: DailyHealthTotals, distance_unit: str = "mi") -> int:
+    """
+    Adds up a fitbit account export csv (the "Activities" and "Sleep" sections) a row at a time;
+    returns the number of rows read
+    """
+    row_count = 0
+    key_suffix = f"_fitbit_{person}"
+    header = None
+    with open(export_path, newline="") as export_f:
+        for row in csv.reader(export_f):
+            # sections are a title row, a header row and rows of data, separated by blank rows
+            if not row or not any(cell.strip() for cell in row):
+                header = None
+                continue
+            if header is None:
+                if "Date" in row or "End Time" in row:
+                    header = row
+                continue
+            values = dict(zip(header, row))
+            row_count += 1
+            if "Steps" in values:
+                date_string = _parse_fitbit_csv_date(values["Date"])
+                totals.add(date_string, "steps", key_suffix, _fitbit_number(values["Steps"]))
+                miles = _fitbit_number(values.get("Distance", ""))
+                totals.add(date_string, "miles", key_suffix, miles / KILOMETERS_PER_MILE if distance_unit == "km" else miles)
+                if "Activity Calories" in values:
+                    totals.add(date_string, "active_calories", key_suffix, _fitbit_number(values["Activity Calories"]))
+            elif "Minutes Asleep" in values:
+                # "2022-06-26 7:02AM"; the day it ended on
+                totals.add(_parse_fitbit_csv_date(values["End Time"].split(" ")[0]), "sleep_minutes", key_suffix,
+                           _fitbit_number(values["Minutes Asleep"]))
+    return row_count
+
+
+def merge_into_health_file(health_data_path: Path, new_totals: Dict[str, Dict[str, float]]) -> None:
+    """
+    Merges the totals into the health file (keyed by date), keeping any keys not ingested this time
+    """
+    health_data: Dict[str, Dict[str, float]] = {}
+    if health_data_path.exists():
+        with open(health_data_path) as health_data_f:
+            health_data = json.load(health_data_f)
+    for date_string, day_totals in new_totals.items():
+        health_data.setdefault(date_string, {}).update(day_totals)
+    with open(health_data_path, "w") as health_data_f:
+        json.dump(dict(sorted(health_data.items())), health_data_f, indent=4)
+
+
+def _person_and_path(argument: str) -> Tuple[str, Path]:
+    person, _, path = argument.partition("=")
+    if not path:
+        raise argparse.ArgumentTypeError("expected PERSON=PATH, i.e. bb=./export.xml")
+    return person, Path(path).expanduser()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="add up raw apple health / fitbit exports into a trip's health file")
+    parser.add_argument("--trip", help="name of the trip in trips.json (defaults to the first one)")
+    parser.add_argument("--apple", action="append", default=[], type=_person_and_path, metavar="PERSON=EXPORT_XML")
+    parser.add_argument("--apple-source", help="only use apple records whose sourceName contains this, i.e. Watch")
+    parser.add_argument("--fitbit", action="append", default=[], type=_person_and_path, metavar="PERSON=EXPORT_FOLDER_OR_CSV")
+    parser.add_argument("--fitbit-distance-unit", choices=["mi", "km"], default="mi", help="distance unit of fitbit csv exports")
+    parser.add_argument("--output", help="health file to merge into (defaults to the trip's health file)")
+    args = parser.parse_args()
+
+    trips = load_trip_configs()
+    if args.trip is None:
+        trip = trips[0]
+    else:
+        matching_trips = [trip for trip in trips if trip.name == args.trip]
+        if not matching_trips:
+            raise ValueError(f"no trip named {args.trip!r} in trips.json; the trips are {[trip.name for trip in trips]}")
+        trip = matching_trips[0]
+    totals = DailyHealthTotals(trip)
+
+    for person, export_path in args.apple:
+        count = ingest_apple_health_export(export_path, person, totals, args.apple_source)
+        print(f"read {count} apple health records for {person}")
+    for person, export_path in args.fitbit:
+        if export_path.is_dir():
+            count = ingest_fitbit_json_export(export_path, person, totals)
+        else:
+            count = ingest_fitbit_csv_export(export_path, person, totals, args.fitbit_distance_unit)
+        print(f"read {count} fitbit entries for {person}")
+
+    merge_into_health_file(Path(args.output or trip.health_data_path), totals.rounded())
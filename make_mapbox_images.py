@@ -5,7 +5,8 @@ from threading import local
 from classes import SwarmCheckinData
 from cleaning_swarm_checkins import clean_swarm_data
 from pathlib import Path
-import urllib.request
+from http_client import get_default_client
+from asset_fingerprinting import AssetManifest
 
 def get_mapbox_api_key():
     # put the api key in a file called "mapbox_api_key.txt"
@@ -54,9 +55,10 @@ def get_request_url_from_coords(locations, max_latitude: float, max_longitude: f
 
 def generate_images(output_folder_path: str, swarm_data: SwarmCheckinData) -> None:
     """
-    Outputs a list of images, of the form "mapbox-<date of data>.png into the folder given
-    by [output_folder_path]
+    Outputs a list of images, of the form "mapbox-<date of data>.<fingerprint>.png into the folder given
+    by [output_folder_path] (which should be inside ./static), recording them in the asset manifest
     """
+    asset_manifest = AssetManifest()
     folder_path = Path(output_folder_path)
     if not folder_path.exists():
         folder_path.mkdir()
@@ -90,12 +92,17 @@ def generate_images(output_folder_path: str, swarm_data: SwarmCheckinData) -> No
 
         if date == "2022-08-15":
             print(api_call_url)
-            urllib.request.urlretrieve(api_call_url, folder_path.joinpath(f'mapbox-{date}.png'))
+            image_path = folder_path.joinpath(f'mapbox-{date}.png')
+            get_default_client().download(api_call_url, image_path)
+            asset_manifest.fingerprint_file(image_path)
         
         count += 1
         if count >= inf:
             break
 
+    asset_manifest.collect_garbage()
+    asset_manifest.save()
+
 if __name__ == "__main__":
     generate_images(output_folder_path="./static/mapbox", swarm_data=SwarmCheckinData(clean_swarm_data()))
         
@@ -0,0 +1,156 @@
+# This file keeps track of how large the generated content is, so that regressions like the whole
+# album ending up in the frontmatter of a page get caught by the build instead of by readers
+#
+# The build records every .md file it writes (see WebSectionBuilder._write_content_file); after hugo
+# has run, `python size_report.py` does the same for the html in ./public
+import fnmatch
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+CONTENT_SIZE_BUDGETS_PATH = "./site_building_data/content_size_budgets.json"
+
+# frontmatter fields that get their own column in the report (the rest only count towards the frontmatter total)
+TRACKED_FIELDS = ("images", "healthData", "checkin_data")
+
+
+def load_size_budgets(budgets_path: str = CONTENT_SIZE_BUDGETS_PATH) -> Dict[str, Any]:
+    """
+    Returns the budgets, of the form:
+    {
+        "default": {metric: {"warn": bytes or count, "fail": bytes or count}},
+        "overrides": {path glob relative to the trip's folder of the content folder: {metric: {...}}}
+    }
+    where metric is one of the keys of ContentFileSize.metrics()
+    """
+    with open(budgets_path, "r") as budgets_f:
+        return json.load(budgets_f)
+
+
+class ContentFileSize:
+    """
+    Sizes (in bytes, utf-8 encoded) of a single generated file
+    """
+
+    def __init__(self, path: str, field_bytes: Dict[str, int], body_bytes: int, image_references: int) -> None:
+        self.path = path
+        self.field_bytes = field_bytes
+        self.body_bytes = body_bytes
+        self.image_references = image_references
+
+    @property
+    def frontmatter_bytes(self) -> int:
+        # the two "---\n" fences are part of the frontmatter
+        return sum(self.field_bytes.values()) + 8
+
+    @property
+    def total_bytes(self) -> int:
+        return self.frontmatter_bytes + self.body_bytes
+
+    def metrics(self) -> Dict[str, int]:
+        metrics = {
+            "total_bytes": self.total_bytes,
+            "frontmatter_bytes": self.frontmatter_bytes,
+            "body_bytes": self.body_bytes,
+            "image_references": self.image_references,
+        }
+        for field in TRACKED_FIELDS:
+            metrics[field + "_bytes"] = self.field_bytes.get(field, 0)
+        return metrics
+
+
+class ContentSizeReport:
+    """
+    Collects the size of every file written during build_content and checks them against the budgets
+    """
+
+    def __init__(self, content_folder_path: Path, budgets: Optional[Dict[str, Any]] = None,
+                       output_subtree: str = "") -> None:
+        self._content_folder_path = content_folder_path
+        # overrides are matched relative to the trip's subtree, so "photos/*.md" matches the galleries of every trip
+        self._output_subtree = output_subtree.strip("/")
+        self._budgets = budgets if budgets is not None else {"default": {}, "overrides": {}}
+        self._files: List[ContentFileSize] = []
+
+    def record(self, path: Path, field_strings: Dict[str, str], body: str, image_references: int) -> None:
+        """
+        Records a written file; field_strings is the yaml text of each top level frontmatter field
+        """
+        field_bytes = {field: len(field_string.encode("utf-8")) for field, field_string in field_strings.items()}
+        relative_path = Path(path).relative_to(self._content_folder_path).as_posix()
+        self._files.append(ContentFileSize(relative_path, field_bytes, len(body.encode("utf-8")), image_references))
+
+    @property
+    def files(self) -> List[ContentFileSize]:
+        return self._files.copy()
+
+    def _budget_for(self, path: str) -> Dict[str, Dict[str, int]]:
+        budget = dict(self._budgets.get("default", {}))
+        if self._output_subtree and path.startswith(self._output_subtree + "/"):
+            path = path[len(self._output_subtree) + 1:]
+        for pattern, override in self._budgets.get("overrides", {}).items():
+            if fnmatch.fnmatch(path, pattern):
+                budget.update(override)
+        return budget
+
+    def check_budgets(self) -> None:
+        """
+        Prints a warning for every budget exceeded; raises a RuntimeError listing every "fail" budget exceeded
+        """
+        failures = []
+        for file_size in self._files:
+            budget = self._budget_for(file_size.path)
+            for metric, value in file_size.metrics().items():
+                if metric not in budget:
+                    continue
+                limits = budget[metric]
+                if "fail" in limits and value > limits["fail"]:
+                    failures.append(f"{file_size.path}: {metric} is {value}, over the budget of {limits['fail']}")
+                elif "warn" in limits and value > limits["warn"]:
+                    print(f"WARNING size budget: {file_size.path}: {metric} is {value}, over the warning level of {limits['warn']}")
+        if failures:
+            raise RuntimeError("generated content is over its size budget:\n" + "\n".join(failures))
+
+    def format_report(self) -> str:
+        columns = ["total", "frontmatter"] + list(TRACKED_FIELDS) + ["body", "images #"]
+        lines = ["".join(f"{column:>14}" for column in columns) + "  path"]
+        totals = [0] * len(columns)
+        for file_size in sorted(self._files, key=lambda file_size: file_size.total_bytes, reverse=True):
+            row = [file_size.total_bytes, file_size.frontmatter_bytes]
+            row += [file_size.field_bytes.get(field, 0) for field in TRACKED_FIELDS]
+            row += [file_size.body_bytes, file_size.image_references]
+            totals = [total + value for total, value in zip(totals, row)]
+            lines.append("".join(f"{value:>14,}" for value in row) + "  " + file_size.path)
+        lines.append("".join(f"{value:>14,}" for value in totals) + f"  TOTAL ({len(self._files)} files)")
+        return "\n".join(lines)
+
+    def print_report(self) -> None:
+        print("size of generated content (bytes):")
+        print(self.format_report())
+
+
+def report_html_sizes(public_folder_path: Path, budgets: Dict[str, Any]) -> None:
+    """
+    Prints the size of each html page hugo generated, checking them against the "html_bytes" budgets
+    """
+    html_sizes = {html_path.relative_to(public_folder_path).as_posix(): html_path.stat().st_size
+                  for html_path in public_folder_path.rglob("*.html")}
+    failures = []
+    for path, size in sorted(html_sizes.items(), key=lambda item: item[1], reverse=True):
+        print(f"{size:>14,}  {path}")
+        limits = budgets.get("default", {}).get("html_bytes", {})
+        for pattern, override in budgets.get("overrides", {}).items():
+            if fnmatch.fnmatch(path, pattern) and "html_bytes" in override:
+                limits = override["html_bytes"]
+        if "fail" in limits and size > limits["fail"]:
+            failures.append(f"{path}: html is {size} bytes, over the budget of {limits['fail']}")
+        elif "warn" in limits and size > limits["warn"]:
+            print(f"WARNING size budget: {path}: html is {size} bytes, over the warning level of {limits['warn']}")
+    print(f"{sum(html_sizes.values()):>14,}  TOTAL ({len(html_sizes)} pages)")
+    if failures:
+        raise RuntimeError("generated html is over its size budget:\n" + "\n".join(failures))
+
+
+if __name__ == "__main__":
+    report_html_sizes(Path(sys.argv[1] if len(sys.argv) > 1 else "./public"), load_size_budgets())
@@ -1,9 +1,12 @@
 from email.mime import image
 import os
-from typing import Dict, List
-import requests
+from typing import Callable, Dict, List, Optional
+from http_client import HttpClient, get_default_client
 import json
 import datetime
+from image_processing import add_image_placeholders
+from date_normalization import bucket_image_times, group_by_day
+from image_index import ImageIndex, normalize_keywords
 
 def get_smugmug_api_key() -> str:
     if os.environ.get('APP_LOCATION') == "netlify":
@@ -15,12 +18,24 @@ def get_smugmug_api_key() -> str:
     
 
 
-def get_smugmug_data():
+# the album with all the pictures from the europe trip
+DEFAULT_ALBUM_KEY = "CnMdTP"
+# nothing can be built without the album, so the build waits out a rate limit of up to this long
+# (well inside netlify's build time limit) rather than failing the deploy
+ALBUM_MAX_RETRY_AFTER_SECONDS = 10 * 60
+
+def get_smugmug_data(album_key: str = DEFAULT_ALBUM_KEY, client: Optional[HttpClient] = None,
+                     include_date: Optional[Callable[[str], bool]] = None, *,
+                     clock_shift_seconds: int, date_overrides: Dict[str, str]):
     """
     Returns a json for all pictures from the trip by making smugmug api request
+    client is optional (defaults to the shared client), and lets several albums share connections
+    include_date keeps only the images on matching days (before any thumbnails are processed)
+    clock_shift_seconds and date_overrides are the trip's camera clock shift and image date overrides
+    (required, so the album is never bucketed into days differently from the trip's build)
     """
-    # all the pictures from the europe trip
-    url = "https://www.smugmug.com/api/v2/album/CnMdTP!images?count=10000"
+    client = client or get_default_client()
+    url = f"https://www.smugmug.com/api/v2/album/{album_key}!images?count=10000"
 
     params = {
         "count": 10000,
@@ -29,11 +44,20 @@ def get_smugmug_data():
     }
     headers = {'Accept': 'application/json'}
 
-    resp = requests.get(url=url, params=params, headers=headers)
+    resp = client.get(url, params=params, headers=headers, max_retry_after_seconds=ALBUM_MAX_RETRY_AFTER_SECONDS)
+    resp.raise_for_status()
     data = resp.json()
 
-    data = json_reformatting(data)
-    return data
+    favs_out, all_out, key_to_metadata, image_index = json_reformatting(data, clock_shift_seconds=clock_shift_seconds, date_overrides=date_overrides)
+    if include_date is not None:
+        all_out = {date: image_keys for date, image_keys in all_out.items() if include_date(date)}
+        key_to_metadata = {image_key: key_to_metadata[image_key] for image_keys in all_out.values() for image_key in image_keys}
+        image_index = image_index.only_dates(all_out)
+        favs_out = image_index.favorites_by_date()
+
+    # placeholders and thumbnail dimensions so pages don't render blank boxes while images load
+    add_image_placeholders(key_to_metadata, client=client)
+    return favs_out, all_out, key_to_metadata, image_index
 
 
 def get_json_at_file(json_file_path):
@@ -41,10 +65,10 @@ def get_json_at_file(json_file_path):
         return json.load(f)
 
 
-def json_reformatting(json: Dict):
+def json_reformatting(json: Dict, *, clock_shift_seconds: int, date_overrides: Dict[str, str]):
     """
-    Returns a few new json style dictionaries:
-    One contains only the favorites:
+    Returns a few new json style dictionaries (and the keyword / favorites index, see image_index.py):
+    One contains only the favorites (images with a "fav" keyword):
         Maps Date ==> List[ImageKey]
     The other contains all the images:
         Maps Date ==> List[ImageKey]
@@ -58,49 +82,39 @@ def json_reformatting(json: Dict):
     }
     """
 
-    date_overrides = get_json_at_file("./site_building_data/image_date_overrides.json")
-
-    # TODO favs and keywords once they are working
-    favs_out = {}
-    all_out = {}
     key_to_metadata = {}
     count_without_date = 0
-    for image_data in json["Response"]["AlbumImage"]:
-        title = image_data["Title"]
-        # 2022-07-11T13:50:19+00:00 should be 
-        date_format_parse = "%Y-%m-%dT%H:%M:%S"
-        # the :10 is to strip the more accurate part of the time
+    album_images = json["Response"]["AlbumImage"]
+    for image_data in album_images:
         image_key = image_data["ImageKey"]
-        caption = image_data["Caption"]
-        largest_uri = image_data["ArchivedUri"]
-        thumbnail_uri = image_data["ThumbnailUrl"]
-        largewidth = image_data["OriginalWidth"]
-        largeheight = image_data["OriginalHeight"]
-
-        if image_key in date_overrides:
-            date = date_overrides[image_key]
-        else:
-            datestr = image_data["DateTimeOriginal"][:-6]
-            parsed_date = datetime.datetime.strptime(datestr, date_format_parse)
-            # shift the pictures to be accurately dated (by 7 hours)
-            shifted_date = (parsed_date - datetime.timedelta(hours=7)).date()
-            date = datetime.datetime.strftime(shifted_date, "%Y-%m-%d")
-
-        if date not in all_out:
-            all_out[date] = [image_key]
-        else:
-            all_out[date].append(image_key)
-        
         key_to_metadata[image_key] = {
-            "largest_uri" : largest_uri,
-            "title" : title,
-            "caption" : caption,
-            "thumbnail_uri" : thumbnail_uri,
-            "largewidth" : str(largewidth),
-            "largeheight" : str(largeheight),
+            "largest_uri" : image_data["ArchivedUri"],
+            "title" : image_data["Title"],
+            "caption" : image_data["Caption"],
+            "thumbnail_uri" : image_data["ThumbnailUrl"],
+            "largewidth" : str(image_data["OriginalWidth"]),
+            "largeheight" : str(image_data["OriginalHeight"]),
+            "keywords" : normalize_keywords(image_data),
         }
+
+    # the whole album is bucketed into days in one pass (the trip's clock shift and date overrides included)
+    image_keys = [image_data["ImageKey"] for image_data in album_images]
+    dates = bucket_image_times(image_keys, [image_data["DateTimeOriginal"] for image_data in album_images],
+                               clock_shift_seconds, date_overrides)
+    all_out = group_by_day(image_keys, dates)
+
+    # keywords and favorites are indexed in the same pass, so nothing has to rescan the album for them
+    image_index = ImageIndex()
+    for image_key, date in zip(image_keys, dates):
+        image_index.add(image_key, date, key_to_metadata[image_key]["keywords"])
+    favs_out = image_index.favorites_by_date()
+
     print("count without date: ", count_without_date)
-    return favs_out, all_out, key_to_metadata
+    return favs_out, all_out, key_to_metadata, image_index
 
 if __name__ == "__main__":
-    get_smugmug_data()
\ No newline at end of file
+    from trips import load_trip_configs
+    # the album is bucketed with the settings of its trip in trips.json
+    trip = next(trip for trip in load_trip_configs() if trip.album_key == DEFAULT_ALBUM_KEY)
+    get_smugmug_data(trip.album_key, clock_shift_seconds=trip.image_clock_shift_seconds,
+                     date_overrides=trip.load_image_date_overrides())
\ No newline at end of file
@@ -0,0 +1,43 @@
+// Loads leaflet (and the zoom home control) the first time a page asks for an interactive map,
+// rather than on every page load; every call returns the same promise
+var loadLeaflet = (function () {
+    var loading = null;
+
+    function addStylesheet(href, integrity) {
+        var link = document.createElement('link');
+        link.rel = 'stylesheet';
+        link.href = href;
+        if (integrity) {
+            link.integrity = integrity;
+            link.crossOrigin = '';
+        }
+        document.head.appendChild(link);
+    }
+
+    function addScript(src, integrity) {
+        return new Promise(function (resolve, reject) {
+            var script = document.createElement('script');
+            script.src = src;
+            if (integrity) {
+                script.integrity = integrity;
+                script.crossOrigin = '';
+            }
+            script.onload = resolve;
+            script.onerror = reject;
+            document.head.appendChild(script);
+        });
+    }
+
+    return function () {
+        if (loading === null) {
+            addStylesheet('https://unpkg.com/leaflet@1.8.0/dist/leaflet.css',
+                'sha512-hoalWLoI8r4UszCkZ5kL8vayOGVae1oxXe/2A4AO6J9+580uKHDO3JdHb7NzwwzK5xr/Fs0W40kiNHxM9vyTtQ==');
+            addStylesheet('https://maxcdn.bootstrapcdn.com/font-awesome/4.3.0/css/font-awesome.min.css');
+            addStylesheet('/css/leaflet.zoomhome.css');
+            loading = addScript('https://unpkg.com/leaflet@1.8.0/dist/leaflet.js',
+                'sha512-BB3hKbKWOc9Ez/TAwyWxNXeoV9c1v6FIeYiBieIWkpLjauysF18NzgR1MBNBXf8/KABdlkX68nAhlwcDFLGPCQ==')
+                .then(function () { return addScript('/js/leaflet.zoomhome.min.js'); });
+        }
+        return loading;
+    };
+})();
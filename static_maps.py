@@ -0,0 +1,71 @@
+# This file draws the checkins of a day (or a whole section) as a small static svg map: the venues
+# projected with web mercator, numbered in the order they were checked into and joined by the route
+# taken, with no map tiles; pages show it straight away and only load leaflet (and its tiles) once
+# the reader asks for the interactive map
+import math
+from typing import Any, Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+MAP_WIDTH = 800
+MAP_HEIGHT = 480
+MAP_PADDING = 40
+# how far in a map of a single venue (or venues very close together) is zoomed, in mercator units
+MIN_SPAN = 0.0005
+
+BACKGROUND_COLOR = "#e8eef1"
+ROUTE_COLOR = "#4a7dbf"
+MARKER_COLOR = "#c0392b"
+
+
+def mercator(latitude: float, longitude: float) -> Tuple[float, float]:
+    """
+    Projects to web mercator, with x and y both in [0, 1] and y growing southwards (like svg)
+    """
+    latitude = max(-85.0511, min(85.0511, latitude))
+    x = (longitude + 180) / 360
+    y = (1 - math.log(math.tan(math.radians(latitude)) + 1 / math.cos(math.radians(latitude))) / math.pi) / 2
+    return x, y
+
+
+def project_checkins(checkins: List[Dict[str, Any]], width: int = MAP_WIDTH, height: int = MAP_HEIGHT,
+                     padding: int = MAP_PADDING) -> List[Tuple[float, float]]:
+    """
+    Returns the svg (x, y) of each checkin, scaled (keeping the aspect ratio) and centred to fit the map
+    """
+    projected = [mercator(checkin["latitude"], checkin["longitude"]) for checkin in checkins]
+    min_x = min(x for x, _ in projected)
+    max_x = max(x for x, _ in projected)
+    min_y = min(y for _, y in projected)
+    max_y = max(y for _, y in projected)
+    span_x = max(max_x - min_x, MIN_SPAN)
+    span_y = max(max_y - min_y, MIN_SPAN)
+    scale = min((width - 2 * padding) / span_x, (height - 2 * padding) / span_y)
+    center_x = (min_x + max_x) / 2
+    center_y = (min_y + max_y) / 2
+    return [(width / 2 + (x - center_x) * scale, height / 2 + (y - center_y) * scale) for x, y in projected]
+
+
+def render_checkin_map(checkins: List[Dict[str, Any]], width: int = MAP_WIDTH, height: int = MAP_HEIGHT) -> str:
+    """
+    Returns the svg map of the checkins (the cleaned swarm data, in time order); "" if there are none
+    """
+    if not checkins:
+        return ""
+    points = project_checkins(checkins, width, height)
+
+    lines = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="{width}" height="{height}" '
+             f'font-family="sans-serif" font-size="11" role="img">',
+             f"<title>map of {len(checkins)} checkins</title>",
+             f'<rect width="{width}" height="{height}" fill="{BACKGROUND_COLOR}"/>']
+    if len(points) > 1:
+        route = " ".join(f"{x:.1f},{y:.1f}" for x, y in points)
+        lines.append(f'<polyline points="{route}" fill="none" stroke="{ROUTE_COLOR}" stroke-width="3" '
+                     f'stroke-linejoin="round" stroke-linecap="round" stroke-opacity="0.8"/>')
+    for number, (checkin, (x, y)) in enumerate(zip(checkins, points), start=1):
+        # venues checked into more than once are drawn once per checkin; the later number ends up on top
+        lines.append(f'<g><title>{escape(checkin["venue_name"])}</title>'
+                     f'<circle cx="{x:.1f}" cy="{y:.1f}" r="9" fill="{MARKER_COLOR}" stroke="#fff" stroke-width="2"/>'
+                     f'<text x="{x:.1f}" y="{y + 4:.1f}" text-anchor="middle" fill="#fff">{number}</text></g>')
+    lines.append("</svg>")
+    return "\n".join(lines) + "\n"
+
@@ -0,0 +1,46 @@
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# the build modules live at the root of the repo
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def local_server():
+    """
+    Starts local http servers standing in for smugmug and friends: local_server(respond) answers every
+    GET with respond(path) => (status, headers, body) and returns the server's base url and the list of
+    paths requested so far
+    """
+    servers = []
+
+    def start(respond):
+        requests_made = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests_made.append(self.path)
+                status, headers, body = respond(self.path)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}", requests_made
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
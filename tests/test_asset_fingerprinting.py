@@ -0,0 +1,25 @@
+import json
+
+from asset_fingerprinting import AssetManifest
+
+
+def test_build_assets_are_kept_out_of_the_committed_manifest(tmp_path):
+    manifest_path = tmp_path / "data" / "generated_assets.json"
+    build_manifest_path = tmp_path / "data" / "build_assets.json"
+    headers_path = tmp_path / "static" / "_headers"
+    manifest = AssetManifest(manifest_path, tmp_path / "static", build_manifest_path)
+
+    mapbox_url = manifest.write_asset("/mapbox/mapbox-2022-08-15.png", b"png")
+    map_url = manifest.write_build_asset("/maps/day-2022-08-15.svg", b"<svg/>")
+    manifest.collect_garbage()
+    manifest.save()
+    manifest.write_netlify_headers(headers_path)
+
+    assert json.loads(manifest_path.read_text()) == {"/mapbox/mapbox-2022-08-15.png": mapbox_url}
+    assert json.loads(build_manifest_path.read_text()) == {"/maps/day-2022-08-15.svg": map_url}
+    assert manifest.rewrite_references({"mapSvg": "/maps/day-2022-08-15.svg"}) == {"mapSvg": map_url}
+    headers = headers_path.read_text()
+    assert mapbox_url in headers and map_url in headers
+
+    reloaded = AssetManifest(manifest_path, tmp_path / "static", build_manifest_path)
+    assert reloaded.url_for("/maps/day-2022-08-15.svg") == map_url
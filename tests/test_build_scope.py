@@ -0,0 +1,49 @@
+import datetime
+
+import pytest
+
+from trips import BuildScope
+
+
+class Entry:
+    def __init__(self, date_string):
+        self._date = datetime.datetime.strptime(date_string, "%Y-%m-%d")
+
+    def entry_date(self):
+        return self._date
+
+    def has_date_in_title(self):
+        return True
+
+
+class Section:
+    def __init__(self, title, date_strings):
+        self._title = title
+        self._entries = [Entry(date_string) for date_string in date_strings]
+
+    def title_text(self):
+        return self._title
+
+    def entries(self):
+        return self._entries
+
+
+SECTIONS = [Section("Overview", []),
+            Section("France", ["2022-07-14", "2022-07-15"]),
+            Section("Italy", ["2022-07-20"]),
+            Section("Miscellany", [])]
+
+
+def test_known_section_matches():
+    BuildScope(["France"]).check_matches(SECTIONS)
+    BuildScope(start_date="2022-07-15", end_date="2022-07-16").check_matches(SECTIONS)
+
+
+def test_unknown_section_title_lists_the_sections():
+    with pytest.raises(ValueError, match="Italy"):
+        BuildScope(["France", "Itally"]).check_matches(SECTIONS)
+
+
+def test_empty_date_window_raises():
+    with pytest.raises(ValueError, match="nothing to build"):
+        BuildScope(["Italy"], start_date="2022-07-14", end_date="2022-07-15").check_matches(SECTIONS)
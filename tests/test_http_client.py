@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import http_client
+from http_client import HttpClient
+
+
+@pytest.fixture
+def rate_limited_server(local_server):
+    """
+    Answers the first request to each path with a 429 whose Retry-After is the path (i.e. /120), then 200s
+    """
+    answered = set()
+
+    def respond(path):
+        if path not in answered:
+            answered.add(path)
+            return 429, {"Retry-After": path.strip("/")}, b""
+        return 200, {}, b""
+
+    return local_server(respond)
+
+
+def test_short_retry_after_is_waited_for(rate_limited_server):
+    base_url, requests_made = rate_limited_server
+    with HttpClient() as client:
+        response = client.get(base_url + "/0")
+    assert response.status_code == 200
+    assert requests_made == ["/0", "/0"]
+
+
+def test_retry_after_longer_than_the_cap_returns_the_429(rate_limited_server):
+    base_url, requests_made = rate_limited_server
+    start_time = time.monotonic()
+    with HttpClient(max_retry_after_seconds=60) as client:
+        response = client.get(base_url + "/120")
+    assert response.status_code == 429
+    assert requests_made == ["/120"]
+    assert time.monotonic() - start_time < 5
+
+
+def test_a_request_can_wait_longer_than_the_clients_cap(rate_limited_server):
+    base_url, requests_made = rate_limited_server
+    start_time = time.monotonic()
+    with HttpClient(max_retry_after_seconds=0) as client:
+        response = client.get(base_url + "/1", max_retry_after_seconds=5)
+    assert response.status_code == 200
+    assert requests_made == ["/1", "/1"]
+    assert time.monotonic() - start_time >= 1
+
+
+@pytest.fixture
+def recorded_sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(http_client.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def test_server_errors_are_retried_with_growing_backoff(local_server, recorded_sleeps):
+    failures_left = [2]
+
+    def respond(path):
+        if failures_left[0]:
+            failures_left[0] -= 1
+            return 503, {}, b""
+        return 200, {}, b"ok"
+
+    base_url, requests_made = local_server(respond)
+    with HttpClient(backoff_base_seconds=1) as client:
+        response = client.get(base_url + "/album")
+        assert client.metrics[-1].attempts == 3
+    assert response.status_code == 200
+    assert requests_made == ["/album"] * 3
+    # full jitter: each wait is somewhere below the doubling backoff of its attempt
+    assert len(recorded_sleeps) == 2
+    assert 0 <= recorded_sleeps[0] <= 2 and 0 <= recorded_sleeps[1] <= 4
+
+
+def test_server_errors_are_returned_once_the_attempts_run_out(local_server, recorded_sleeps):
+    base_url, requests_made = local_server(lambda path: (502, {}, b""))
+    with HttpClient(max_attempts=3) as client:
+        response = client.get(base_url + "/album")
+    assert response.status_code == 502
+    assert requests_made == ["/album"] * 3
+    assert len(recorded_sleeps) == 2
+
+
+def test_requests_in_flight_to_a_host_are_bounded(local_server):
+    lock = threading.Lock()
+    in_flight = [0]
+    most_in_flight = [0]
+
+    def respond(path):
+        with lock:
+            in_flight[0] += 1
+            most_in_flight[0] = max(most_in_flight[0], in_flight[0])
+        time.sleep(0.1)
+        with lock:
+            in_flight[0] -= 1
+        return 200, {}, b""
+
+    base_url, requests_made = local_server(respond)
+    with HttpClient(max_concurrent_per_host=2) as client, ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda number: client.get(f"{base_url}/{number}"), range(8)))
+    assert [response.status_code for response in responses] == [200] * 8
+    assert len(requests_made) == 8
+    assert most_in_flight[0] == 2
@@ -0,0 +1,107 @@
+import hashlib
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from http_client import HttpClient
+from image_processing import ImageCache, add_image_placeholders
+
+RED = (200, 30, 30)
+BLUE = (20, 40, 210)
+
+
+def jpeg_bytes(size, color):
+    image_f = io.BytesIO()
+    Image.new("RGB", size, color).save(image_f, format="JPEG")
+    return image_f.getvalue()
+
+
+RED_JPEG = jpeg_bytes((150, 100), RED)
+
+
+@pytest.fixture
+def image_server(local_server):
+    """
+    Serves jpegs from a local stand in for smugmug, counting the requests made to it
+    """
+    images = {"/red.jpg": RED_JPEG, "/blue.jpg": jpeg_bytes((80, 120), BLUE)}
+
+    def respond(path):
+        if path not in images:
+            return 404, {}, b""
+        return 200, {"Content-Type": "image/jpeg"}, images[path]
+
+    return local_server(respond)
+
+
+def metadata_for(base_url, *paths):
+    return {path.strip("/").split(".")[0]: {"thumbnail_uri": base_url + path} for path in paths}
+
+
+def hex_color(color):
+    return "#%02x%02x%02x" % color
+
+
+def assert_close_color(hex_string, color):
+    red, green, blue = (int(hex_string[i:i + 2], 16) for i in (1, 3, 5))
+    assert all(abs(actual - expected) <= 12 for actual, expected in zip((red, green, blue), color)), (hex_string, hex_color(color))
+
+
+def test_placeholders_dominant_color_and_dimensions(image_server, tmp_path):
+    base_url, _ = image_server
+    key_to_metadata = metadata_for(base_url, "/red.jpg", "/blue.jpg")
+    with HttpClient() as client:
+        add_image_placeholders(key_to_metadata, cache_path=tmp_path, client=client)
+
+    assert key_to_metadata["red"]["placeholder"].startswith("data:image/jpeg;base64,")
+    assert (key_to_metadata["red"]["thumbnail_width"], key_to_metadata["red"]["thumbnail_height"]) == ("150", "100")
+    assert (key_to_metadata["blue"]["thumbnail_width"], key_to_metadata["blue"]["thumbnail_height"]) == ("80", "120")
+    assert_close_color(key_to_metadata["red"]["dominant_color"], RED)
+    assert_close_color(key_to_metadata["blue"]["dominant_color"], BLUE)
+
+
+def test_second_run_uses_the_cache(image_server, tmp_path):
+    base_url, requests_made = image_server
+    with HttpClient() as client:
+        add_image_placeholders(metadata_for(base_url, "/red.jpg", "/blue.jpg"), cache_path=tmp_path, client=client)
+    assert len(requests_made) == 2
+
+    requests_made.clear()
+    key_to_metadata = metadata_for(base_url, "/red.jpg", "/blue.jpg")
+    with HttpClient() as client:
+        add_image_placeholders(key_to_metadata, cache_path=tmp_path, client=client)
+    assert requests_made == []
+    assert key_to_metadata["red"]["thumbnail_width"] == "150"
+
+
+def test_missing_thumbnail_is_skipped(image_server, tmp_path):
+    base_url, _ = image_server
+    key_to_metadata = metadata_for(base_url, "/red.jpg", "/deleted.jpg")
+    with HttpClient() as client:
+        add_image_placeholders(key_to_metadata, cache_path=tmp_path, client=client)
+
+    assert "placeholder" in key_to_metadata["red"]
+    assert key_to_metadata["deleted"] == {"thumbnail_uri": base_url + "/deleted.jpg"}
+
+
+
+
+def test_identical_objects_stored_from_many_threads_at_once(tmp_path):
+    # albums have the same thumbnail bytes at several urls, which the placeholder workers store concurrently
+    cache = ImageCache(tmp_path)
+    # big enough that the writes overlap
+    large_object = RED_JPEG * 20000
+    start = threading.Barrier(16)
+
+    def put():
+        start.wait()
+        return cache.put_object(large_object)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        content_hashes = list(pool.map(lambda _: put(), range(16)))
+
+    assert set(content_hashes) == {hashlib.sha256(large_object).hexdigest()}
+    assert [path.name for path in tmp_path.joinpath("objects").iterdir()] == content_hashes[:1]
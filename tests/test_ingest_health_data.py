@@ -0,0 +1,21 @@
+from ingest_health_data import DailyHealthTotals, ingest_apple_health_export
+from trips import TripConfig
+
+EXPORT = """<?xml version="1.0" encoding="UTF-8"?>
+<HealthData locale="en_US">
+ <Record type="HKQuantityTypeIdentifierStepCount" sourceName="T's Apple Watch" unit="count" startDate="2022-07-01 09:00:00 +0200" endDate="2022-07-01 09:10:00 +0200" value="1200"/>
+ <Record type="HKQuantityTypeIdentifierStepCount" sourceName="T's Apple Watch" unit="count" startDate="2022-07-01 18:00:00 +0200" endDate="2022-07-01 18:10:00 +0200" value="300.6"/>
+ <Record type="HKQuantityTypeIdentifierDistanceWalkingRunning" sourceName="T's Apple Watch" unit="km" startDate="2022-07-01 09:00:00 +0200" endDate="2022-07-01 09:10:00 +0200" value="1.609344"/>
+ <Record type="HKQuantityTypeIdentifierStepCount" sourceName="T's Apple Watch" unit="count" startDate="2022-09-01 09:00:00 +0200" endDate="2022-09-01 09:10:00 +0200" value="5000"/>
+</HealthData>
+"""
+
+
+def test_apple_totals_for_a_person_with_an_underscore_in_their_name(tmp_path):
+    export_path = tmp_path / "export.xml"
+    export_path.write_text(EXPORT)
+    totals = DailyHealthTotals(TripConfig("europe-2022", "Europe Trip 2022", "doc", "album", "checkins.json",
+                                          "health.json", start_date="2022-06-20", end_date="2022-08-31"))
+
+    assert ingest_apple_health_export(export_path, "t_w", totals) == 4
+    assert totals.rounded() == {"2022-07-01": {"steps_apple_t_w": 1501, "miles_apple_t_w": 1.0}}
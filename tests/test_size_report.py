@@ -0,0 +1,29 @@
+from pathlib import Path
+
+import pytest
+
+from size_report import ContentSizeReport, load_size_budgets
+
+BUDGETS_PATH = str(Path(__file__).resolve().parent.parent.joinpath("site_building_data", "content_size_budgets.json"))
+
+
+def record_gallery(report, path, image_count):
+    image_string = "- src: https://photos.smugmug.com/photos/i-abcdefg/0/0123abcd/Th/i-abcdefg-Th.jpg\n" * image_count
+    report.record(path, {"title": "title: Food\n", "images": "images:\n" + image_string}, "", image_references=image_count)
+
+
+@pytest.mark.parametrize("output_subtree", ["", "japan-2024"])
+def test_a_gallery_of_every_image_of_a_trip_is_within_budget(output_subtree):
+    # a gallery never holds more images than the trip's overview, so it gets the overview's budget
+    content_folder_path = Path("content")
+    report = ContentSizeReport(content_folder_path, load_size_budgets(BUDGETS_PATH), output_subtree)
+    record_gallery(report, content_folder_path.joinpath(output_subtree, "photos", "food.md"), 2500)
+    report.check_budgets()
+
+
+def test_day_pages_keep_the_default_budget():
+    content_folder_path = Path("content")
+    report = ContentSizeReport(content_folder_path, load_size_budgets(BUDGETS_PATH))
+    record_gallery(report, content_folder_path.joinpath("post", "France", "2022-07-14.md"), 2500)
+    with pytest.raises(RuntimeError, match="image_references"):
+        report.check_budgets()
@@ -0,0 +1,225 @@
+# This file describes the trips the site is built from
+# Each trip has its own trip log doc, smugmug album, checkin export, health data and date window,
+# and is built into its own subtree of the content folder
+from __future__ import annotations
+import datetime
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from date_normalization import load_image_date_overrides
+from http_client import HttpClient
+
+TRIP_CONFIGS_PATH = "./site_building_data/trips.json"
+
+
+class TripConfig:
+    """
+    Everything needed to build one trip; see site_building_data/trips.json
+    """
+
+    def __init__(self, name: str, title: str, document_id: str, album_key: str,
+                       checkin_export_path: str, health_data_path: str,
+                       start_date: Optional[str] = None, end_date: Optional[str] = None,
+                       output_subtree: str = "",
+                       image_clock_shift_hours: float = 0,
+                       image_date_overrides_path: Optional[str] = None) -> None:
+        self.name = name
+        self.title = title
+        self.document_id = document_id
+        self.album_key = album_key
+        self.checkin_export_path = checkin_export_path
+        self.health_data_path = health_data_path
+        # "%Y-%m-%d" strings, inclusive; None means unbounded
+        self.start_date = start_date
+        self.end_date = end_date
+        # relative to the content folder; "" builds the trip into the root of the site
+        self.output_subtree = output_subtree
+        # how far the camera's clock (smugmug's DateTimeOriginal) is from the local time, i.e. -7
+        self.image_clock_shift_hours = image_clock_shift_hours
+        # image key => "%Y-%m-%d" for images whose dates are wrong in smugmug; None if there are none
+        self.image_date_overrides_path = image_date_overrides_path
+
+    @classmethod
+    def from_dict(cls, trip_dict: Dict[str, Any]) -> TripConfig:
+        return cls(**trip_dict)
+
+    def in_date_window(self, date_string: str) -> bool:
+        # "%Y-%m-%d" strings compare in date order
+        if self.start_date is not None and date_string < self.start_date:
+            return False
+        if self.end_date is not None and date_string > self.end_date:
+            return False
+        return True
+
+    @property
+    def image_clock_shift_seconds(self) -> int:
+        return int(self.image_clock_shift_hours * 60 * 60)
+
+    def load_image_date_overrides(self) -> Dict[str, str]:
+        if self.image_date_overrides_path is None:
+            return {}
+        return load_image_date_overrides(self.image_date_overrides_path)
+
+    @property
+    def home_url(self) -> str:
+        """
+        The url of the trip's overview page
+        """
+        if self.output_subtree == "":
+            return "/"
+        return "/" + self.output_subtree.strip("/") + "/"
+
+
+class BuildScope:
+    """
+    Which part of a trip a (preview) build covers: sections picked by title and/or entries picked by
+    date window; a scoped build leaves everything else in the content folder alone
+    """
+
+    def __init__(self, section_titles: Optional[List[str]] = None,
+                       start_date: Optional[str] = None, end_date: Optional[str] = None) -> None:
+        # None means every section
+        self.section_titles = set(section_titles) if section_titles else None
+        # "%Y-%m-%d" strings, inclusive; None means unbounded
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def includes_date(self, date_string: str) -> bool:
+        if self.start_date is not None and date_string < self.start_date:
+            return False
+        if self.end_date is not None and date_string > self.end_date:
+            return False
+        return True
+
+    def _has_date_window(self) -> bool:
+        return self.start_date is not None or self.end_date is not None
+
+    def _entry_dates(self, document_section) -> List[str]:
+        return [entry.entry_date().strftime("%Y-%m-%d") for entry in document_section.entries() if entry.has_date_in_title()]
+
+    def includes_section(self, document_section) -> bool:
+        """
+        Whether any of the section is built; with a date window, only sections with entries in it are
+        """
+        if self.section_titles is not None and document_section.title_text() not in self.section_titles:
+            return False
+        return not self._has_date_window() or any(self.includes_date(date) for date in self._entry_dates(document_section))
+
+    def includes_whole_section(self, document_section) -> bool:
+        return self.includes_section(document_section) and all(self.includes_date(date) for date in self._entry_dates(document_section))
+
+    def check_matches(self, document_sections: List[Any]) -> None:
+        """
+        Raises if a section title matches no section, or if nothing at all is in the scope
+        (document_sections is every section of the trips being built)
+        """
+        titles = [document_section.title_text() for document_section in document_sections]
+        if self.section_titles is not None:
+            unknown_titles = sorted(self.section_titles.difference(titles))
+            if unknown_titles:
+                raise ValueError(f"no sections titled {unknown_titles}; the sections are {titles}")
+        if not any(self.includes_section(document_section) for document_section in document_sections):
+            raise ValueError(f"no entries of the sections {sorted(self.section_titles or titles)} are "
+                             f"between {self.start_date or 'the start'} and {self.end_date or 'the end'}; nothing to build")
+
+    def needed_dates(self, document_sections: List[Any]) -> Optional[Set[str]]:
+        """
+        The days whose images, checkins and health data the build needs; None if it needs them all
+        (the overview and miscellany sections, first and last, summarise the whole trip)
+        """
+        if self.includes_section(document_sections[0]) or self.includes_section(document_sections[-1]):
+            return None
+        return {date for document_section in document_sections[1:-1] if self.includes_section(document_section)
+                for date in self._entry_dates(document_section) if self.includes_date(date)}
+
+
+def load_trip_configs(trip_configs_path: str = TRIP_CONFIGS_PATH) -> List[TripConfig]:
+    with open(trip_configs_path, "r") as trips_f:
+        return [TripConfig.from_dict(trip_dict) for trip_dict in json.load(trips_f)]
+
+
+class TripData:
+    """
+    All the fetched data for one trip, restricted to the trip's date window
+    """
+
+    def __init__(self, trip: TripConfig, document_sections: List[Any], image_data: Any,
+                       checkin_data: Any, health_data: Dict[str, Any]) -> None:
+        self.trip = trip
+        self.document_sections = document_sections
+        self.image_data = image_data
+        self.checkin_data = checkin_data
+        self.health_data = health_data
+
+
+def fetch_trip_data(trip: TripConfig, client: Optional[HttpClient] = None, scope: Optional[BuildScope] = None) -> TripData:
+    """
+    Fetches the doc, smugmug album, checkins and health data for the trip
+    client is shared between trips so connections to smugmug are reused
+    With a scope, only the days the scoped build needs are loaded (and have their thumbnails processed)
+    """
+    from classes import SmugMugImageData, SwarmCheckinData
+    from cleaning_swarm_checkins import clean_swarm_data
+    from utils import make_google_api_request, extract_document_sections
+
+    # Google docs log data; the sections hold their own compact copy of the text, so the raw api json is released
+    document = make_google_api_request(document_id=trip.document_id)
+    document_sections = extract_document_sections(document)
+    del document
+
+    needed_dates = scope.needed_dates(document_sections) if scope is not None else None
+    include_date: Callable[[str], bool] = trip.in_date_window
+    if needed_dates is not None:
+        include_date = lambda date: date in needed_dates and trip.in_date_window(date)
+
+    # Smugmug data
+    image_data = SmugMugImageData(album_key=trip.album_key, client=client, include_date=include_date,
+                                  clock_shift_seconds=trip.image_clock_shift_seconds,
+                                  date_overrides=trip.load_image_date_overrides())
+
+    # each section's keywords and favorites, for the section pages
+    image_data.index.add_sections({document_section.title_text(): [entry.entry_date().strftime("%Y-%m-%d")
+                                                                   for entry in document_section.entries() if entry.has_date_in_title()]
+                                   for document_section in document_sections})
+
+    # Checkin data
+    checkin_data = SwarmCheckinData(clean_swarm_data(trip.checkin_export_path, include_date))
+
+    # Health data
+    with open(trip.health_data_path, "r") as health_data_f:
+        health_data = {date: day_health_data for date, day_health_data in json.load(health_data_f).items()
+                       if include_date(date)}
+
+    return TripData(trip, document_sections, image_data, checkin_data, health_data)
+
+
+def make_content_builder(trip_data: TripData, size_budgets: Optional[Dict[str, Any]] = None, asset_manifest=None,
+                         scope: Optional[BuildScope] = None):
+    """
+    Returns the WebContentBuilder for a trip, with the overview (first), miscellany (last) and photos sections set up
+    """
+    from classes import WebContentBuilder, MiscellanySectionBuilder, OverviewSectionBuilder, PhotosSectionBuilder
+    document_sections = trip_data.document_sections
+    content_builder = WebContentBuilder(trip_data.image_data, trip_data.checkin_data, trip_data.health_data,
+                                        document_sections, size_budgets=size_budgets, trip=trip_data.trip,
+                                        asset_manifest=asset_manifest, scope=scope)
+
+    # Miscellany Section is last maybe don't hardcode this but for now its fine
+    content_builder.set_special_section(
+        section_key=document_sections[-1],
+        section_builder_type=MiscellanySectionBuilder
+    )
+
+    # The Overview Section Also needs to be handled seperately, and it is the first section
+    content_builder.set_special_section(
+        section_key=document_sections[0],
+        section_builder_type=OverviewSectionBuilder
+    )
+
+    # Favorites and keyword galleries, from the image index rather than a document section
+    content_builder.set_special_section(
+        section_key="photos",
+        section_builder_type=PhotosSectionBuilder
+    )
+    return content_builder
@@ -101,7 +101,7 @@ def extract_document_sections(document) -> List[DocumentSection]:
 
     return sections
 
-def make_google_api_request(mock=False):
+def make_google_api_request(mock=False, document_id=None):
     creds = None
 
     if os.environ.get('APP_LOCATION') == 'netlify':
@@ -119,7 +119,7 @@ def make_google_api_request(mock=False):
             service = build('docs', 'v1', credentials=creds)
 
             # Retrieve the documents contents from the Docs service.
-            document = service.documents().get(documentId=DOCUMENT_ID).execute()
+            document = service.documents().get(documentId=document_id or DOCUMENT_ID).execute()
         else:
             import pickle
             with open("./mock_api_return.pkl", "rb") as f:
@@ -138,50 +138,24 @@ def dict_to_frontmatter_string(input_dict: Dict) -> str:
     """
     Takes in a dictionary and returns the corresponding frontmatter string in yaml format
     """
-    output = yaml.round_trip_dump(input_dict, explicit_start=False)
-    return "---\n" + output + "---\n"
+    return frontmatter_fields_to_string(frontmatter_field_strings(input_dict))
 
-def paragraph_to_markdown(paragraph_elements) -> str:
-    is_bullet = paragraph_elements[0]['is_bullet']
-    if is_bullet:
-        output = "- "
-    else:
-        output = ""
-
-    for element in paragraph_elements:
-        text_run = element.get('textRun')
-        if text_run:
-            is_bold = 'bold' in text_run.get('textStyle') and text_run.get('textStyle').get('bold')
-            is_italic = 'italic' in text_run.get('textStyle') and text_run.get('textStyle').get('italic')
-            is_link = 'link' in text_run.get('textStyle') and "url" in text_run.get('textStyle').get('link')
-            if is_link:
-                url_link = text_run.get('textStyle').get('link').get('url')
-
-            # special case for handling google empty format sections
-            # as it doesn't convert to markdown nicely
-            if text_run.get('content').strip("\n") == "":
-                continue
-
-            # enclose opening
-            if is_link:
-                output += "["
-            if is_italic:
-                output += "*"
-            if is_bold:
-                output += "**"
-            
-            # add in the actual text
-            output += text_run.get('content').strip("\n")
-
-            # enclose closing
-            if is_bold:
-                output += "**"
-            if is_italic:
-                output += "*"
-            if is_link:
-                output += "](" + url_link + ")"
+def frontmatter_field_strings(input_dict: Dict) -> Dict[str, str]:
+    """
+    Returns the yaml text of each top level field of the dictionary; joined in order they are the
+    same yaml as the whole dictionary dumped at once, but this way the size of each field is known
+    """
+    return {key: yaml.round_trip_dump({key: value}, explicit_start=False) for key, value in input_dict.items()}
 
-    return output
+def frontmatter_fields_to_string(field_strings: Dict[str, str]) -> str:
+    return "---\n" + "".join(field_strings.values()) + "---\n"
+
+def paragraph_to_markdown(paragraph_elements) -> str:
+    """
+    Converts raw google docs paragraph elements to markdown (goes through the compact document model)
+    """
+    from classes import DocumentParagraph
+    return DocumentParagraph.from_elements(paragraph_elements).to_markdown()
 
 def read_paragraph_elements(elements):
     output = ""